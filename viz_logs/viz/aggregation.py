@@ -0,0 +1,174 @@
+from django.conf import settings
+from django.db.models import Aggregate, CharField, Count, FloatField, Max, Sum
+from django.db.models.functions import Coalesce
+from .encoding import decode_histogram, histogram_label, parse_visibility_map
+import json
+
+
+class GroupConcat(Aggregate):
+    """Distinct values in a group, as a list (GROUP_CONCAT / STRING_AGG / json_group_array)
+
+    Values are joined with the ASCII unit separator, which can't appear in a
+    camera id, so ids containing commas survive. MySQL cuts GROUP_CONCAT off
+    at group_concat_max_len, which the connection raises to
+    VIZ_GROUP_CONCAT_MAX_LEN (see settings); a result that reaches it raises
+    instead of silently losing values.
+    """
+    SEPARATOR = '\x1f'
+    function = 'GROUP_CONCAT'
+    template = f"%(function)s(%(distinct)s%(expressions)s SEPARATOR '{SEPARATOR}')"
+    allow_distinct = True
+    output_field = CharField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite's GROUP_CONCAT takes no separator together with DISTINCT
+        return super().as_sql(compiler, connection, function='JSON_GROUP_ARRAY',
+                              template='%(function)s(%(distinct)s%(expressions)s)', **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='STRING_AGG',
+                              template=f"%(function)s(%(distinct)s%(expressions)s::text, '{self.SEPARATOR}')",
+                              **extra_context)
+
+    def get_db_converters(self, connection):
+        return super().get_db_converters(connection) + [self.convert_to_list]
+
+    def convert_to_list(self, value, expression, connection):
+        if not value:
+            return []
+        if connection.vendor == 'sqlite':
+            return json.loads(value)
+        max_len = getattr(settings, 'VIZ_GROUP_CONCAT_MAX_LEN', 1024 * 1024)
+        if connection.vendor == 'mysql' and len(value.encode()) >= max_len:
+            raise ValueError(f"GROUP_CONCAT result reached group_concat_max_len ({max_len} bytes)")
+        return value.split(self.SEPARATOR)
+
+
+class HistogramMerge:
+    """Time-weighted average of per-row percentage histograms
+
+    Every row's distribution is weighted by its time on air, so a row seen
+    for an hour counts sixty times as much as one seen for a minute. If no
+    row has any time on air the rows are averaged with equal weight.
+    """
+
+    def __init__(self):
+        self.weighted = {}
+        self.unweighted = {}
+        self.total_weight = 0
+        self.count = 0
+
+    def add(self, bins, weight):
+        weight = weight or 0
+        for bin_num, value in bins:
+            self.weighted[bin_num] = self.weighted.get(bin_num, 0) + value * weight
+            self.unweighted[bin_num] = self.unweighted.get(bin_num, 0) + value
+        self.total_weight += weight
+        self.count += 1
+
+    def add_sums(self, weighted, unweighted, total_weight, count):
+        """Fold in the partial sums of another merge (as stored by the rollups)"""
+        for bin_num, value in weighted:
+            self.weighted[bin_num] = self.weighted.get(bin_num, 0) + value
+        for bin_num, value in unweighted:
+            self.unweighted[bin_num] = self.unweighted.get(bin_num, 0) + value
+        self.total_weight += total_weight
+        self.count += count
+
+    def bins(self):
+        if self.total_weight > 0:
+            sums, total = self.weighted, self.total_weight
+        else:
+            sums, total = self.unweighted, self.count
+        return [(bin_num, round(sums[bin_num] / total, 2)) for bin_num in sorted(sums)] if total else []
+
+
+class CombinedLogoTime:
+    """Totals of every selected row showing one sponsor logo"""
+
+    def __init__(self, sponsor_logo_name, cameras, display_name, time_on_air, time_on_camera,
+                 created_at, row_count, bins=None):
+        self.sponsor_logo_name = sponsor_logo_name
+        self.cameras = cameras
+        self.group_id = ' + '.join(cameras)
+        self.display_name = display_name
+        self.time_on_air = time_on_air
+        self.time_on_camera = time_on_camera
+        self.created_at = created_at
+        self.row_count = row_count
+        self.bins = bins or []
+
+    def get_histogram_data(self):
+        """Merged histogram in the same format as VizData.get_histogram_data"""
+        return {
+            'labels': [histogram_label(bin_num) for bin_num, _ in self.bins],
+            'values': [value for _, value in self.bins]
+        }
+
+    def as_dict(self):
+        return {
+            'sponsor_logo_name': self.sponsor_logo_name,
+            'cameras': self.cameras,
+            'display_name': self.display_name,
+            'time_on_air': self.time_on_air,
+            'time_on_camera': self.time_on_camera,
+            'created_at': self.created_at,
+            'row_count': self.row_count,
+            'histogram': self.get_histogram_data(),
+        }
+
+
+def combined_logo_time(queryset, histograms=True):
+    """Combine the rows of a VizData queryset per sponsor logo
+
+    Totals, the latest timestamp and the camera list are computed by the
+    database in a single GROUP BY. With ``histograms``, a second pass
+    streams each row's precomputed histogram to build the time-weighted
+    merged histogram and to find the display name of the latest row
+    (without it, display_name is left as None).
+    Results are ordered by latest appearance, newest first.
+    """
+    queryset = queryset.order_by()
+    groups = (queryset.values('sponsor_logo_name')
+              .annotate(total_time_on_air=Coalesce(Sum('time_on_air'), 0, output_field=FloatField()),
+                        total_time_on_camera=Coalesce(Sum('time_on_camera'), 0, output_field=FloatField()),
+                        latest=Max('created_at'),
+                        row_count=Count('id'),
+                        cameras=GroupConcat('group_id', distinct=True))
+              .order_by('-latest'))
+
+    combined = {}
+    for group in groups:
+        combined[group['sponsor_logo_name']] = CombinedLogoTime(
+            sponsor_logo_name=group['sponsor_logo_name'],
+            cameras=sorted(group['cameras']),
+            display_name=None,
+            time_on_air=group['total_time_on_air'],
+            time_on_camera=group['total_time_on_camera'],
+            created_at=group['latest'],
+            row_count=group['row_count'],
+        )
+
+    if histograms and combined:
+        merges = {}
+        # Rows with a precomputed histogram skip the JSON blob entirely
+        precomputed_rows = (queryset.filter(histogram__isnull=False)
+                            .values_list('sponsor_logo_name', 'display_name', 'created_at', 'time_on_air', 'histogram')
+                            .iterator(chunk_size=2000))
+        legacy_rows = (queryset.filter(histogram__isnull=True)
+                       .values_list('sponsor_logo_name', 'display_name', 'created_at', 'time_on_air', 'visibility_map')
+                       .iterator(chunk_size=2000))
+
+        for rows, decode in ((precomputed_rows, decode_histogram), (legacy_rows, parse_visibility_map)):
+            for logo, display_name, created_at, time_on_air, raw in rows:
+                item = combined.get(logo)
+                if item is None:
+                    continue
+                merges.setdefault(logo, HistogramMerge()).add(decode(raw), time_on_air)
+                if created_at == item.created_at and item.display_name is None:
+                    item.display_name = display_name
+
+        for logo, merge in merges.items():
+            combined[logo].bins = merge.bins()
+
+    return list(combined.values())
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class VizConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'viz'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import facets, live, metrics, signals
+        signals.rows_ingested.connect(facets.rows_ingested_receiver, dispatch_uid='viz.facets')
+        signals.rows_ingested.connect(live.rows_ingested_receiver, dispatch_uid='viz.live')
+        connection_created.connect(metrics.install_query_timer, dispatch_uid='viz.metrics')
@@ -0,0 +1,237 @@
+"""Synthetic viz_data tables and the request scenarios measured by ``manage.py benchmark``
+
+Also the process start-up targets measured by ``manage.py benchmark_startup``.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Index, Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from importlib import import_module
+from itertools import combinations
+from .models import VizData
+from datetime import timedelta
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+CAMERAS = 12
+LOGOS = 40
+DAYS = 60
+# Share of rows left without a precomputed histogram, like rows older than the histogram column
+LEGACY_SHARE = 0.05
+INSERT_BATCH = 5000
+# Rows inserted together share a created_at, so the data spans DAYS days
+TIMESTAMP_BLOCK = 500
+
+
+def create_table():
+    """(Re)create viz_data in the current database from the VizData model
+
+    viz_data is unmanaged and migration 0001 predates its real schema, so
+    neither migrate nor the test runner builds a usable table on a fresh
+    database. create_model skips the indexes of unmanaged models, so they
+    are added one by one.
+    """
+    tables = connection.introspection.table_names()
+    with connection.schema_editor() as schema_editor:
+        if VizData._meta.db_table in tables:
+            schema_editor.delete_model(VizData)
+        schema_editor.create_model(VizData)
+        indexes = [Index(fields=[field.name], name=f'{VizData._meta.db_table}_{field.column}_idx')
+                   for field in VizData._meta.local_fields if field.db_index and not field.unique]
+        for index in indexes + VizData._meta.indexes:
+            schema_editor.add_index(VizData, index)
+        import_module('viz.migrations.0002_vizdata_search_index').create_fulltext_index(None, schema_editor)
+
+
+def visibility_map(rng):
+    """A tracker-like visibility map: seconds per 10% bin, skewed and sometimes sparse"""
+    peak = rng.randint(1, 10) * 10
+    bins = {}
+    for bin_num in range(10, 101, 10):
+        if rng.random() < 0.15:
+            continue
+        bins[str(bin_num)] = round(rng.expovariate(1 / 30) * (3 if bin_num == peak else 1), 2)
+    return json.dumps(bins)
+
+
+def build_dataset(rows, seed=0):
+    """Fill a fresh viz_data with ``rows`` synthetic rows; returns the values the scenarios filter on"""
+    create_table()
+    rng = random.Random(seed)
+    batch = []
+    for i in range(rows):
+        camera = rng.randrange(CAMERAS)
+        item = VizData(
+            group_id=f"CAM{camera:02d}",
+            display_name=f"Camera {camera}",
+            sponsor_logo_name=f"Sponsor {rng.randrange(LOGOS):02d}",
+            time_on_air=round(rng.uniform(0, 600), 2),
+            time_on_camera=round(rng.uniform(0, 600), 2),
+            visibility_map=visibility_map(rng),
+        )
+        if rng.random() >= LEGACY_SHARE:
+            item.refresh_histogram()
+        batch.append(item)
+        if len(batch) >= INSERT_BATCH:
+            VizData.objects.bulk_create(batch)
+            batch = []
+    VizData.objects.bulk_create(batch)
+
+    # created_at is auto_now_add, so spread the timestamps out afterwards
+    bounds = VizData.objects.aggregate(first=Min('id'), last=Max('id'))
+    start = timezone.now() - timedelta(days=DAYS)
+    blocks = max(1, rows // TIMESTAMP_BLOCK)
+    step = timedelta(days=DAYS) / blocks
+    for block in range(blocks + 1):
+        low = bounds['first'] + block * TIMESTAMP_BLOCK
+        VizData.objects.filter(id__gte=low, id__lt=low + TIMESTAMP_BLOCK).update(created_at=start + step * block)
+
+    sample = VizData.objects.order_by('id')[rows // 2]
+    return {
+        'search': sample.sponsor_logo_name,
+        'group_id': sample.group_id,
+        'viz_name': sample.sponsor_logo_name,
+        'created_at': timezone.localtime(sample.created_at).strftime('%Y-%m-%d'),
+        'date_from': timezone.localtime(sample.created_at - timedelta(days=7)).strftime('%Y-%m-%d'),
+        'pk': sample.pk,
+        'ids': list(VizData.objects.order_by('-id').values_list('id', flat=True)[:10]),
+    }
+
+
+class Scenario:
+    """One request to measure and the most queries it may take"""
+
+    def __init__(self, name, method, url, data, max_queries):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.data = data
+        self.max_queries = max_queries
+
+    def request(self, client):
+        response = getattr(client, self.method)(self.url, self.data)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code != 200:
+            raise AssertionError(f"{self.name}: {self.method.upper()} {self.url} returned {response.status_code}")
+        return response
+
+
+def scenarios(values):
+    """The index view with every combination of filters, the histogram APIs and PDF export"""
+    filters = ('search', 'group_id', 'viz_name', 'created_at')
+    items = []
+    for size in range(len(filters) + 1):
+        for names in combinations(filters, size):
+            name = 'index' + ''.join(f'+{filter_name}' for filter_name in names)
+            items.append(Scenario(name, 'get', '/', {filter_name: values[filter_name] for filter_name in names}, 5))
+    items += [
+        Scenario('index+date_range', 'get', '/', {'date_from': values['date_from'], 'date_to': values['created_at']}, 5),
+        Scenario('histogram', 'get', f"/api/histogram/{values['pk']}/", {}, 2),
+        Scenario('histograms', 'get', '/api/histograms/', {'ids': ','.join(map(str, values['ids']))}, 2),
+        Scenario('histograms+viz_name', 'get', '/api/histograms/', {'viz_name': values['viz_name']}, 2),
+        Scenario('export_pdf', 'post', '/export/pdf/', {'selected_ids[]': values['ids']}, 5),
+    ]
+    return items
+
+
+def measure(scenario, client=None, repeat=5):
+    """Best latency (ms), query count and peak traced memory (KiB) of a warm scenario
+
+    The best of ``repeat`` runs is the least noisy figure on a shared
+    machine. Latency is timed without tracemalloc, which slows
+    allocation-heavy code down; a separate traced run gives the query
+    count and peak memory.
+    """
+    client = client or Client()
+    scenario.request(client)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        scenario.request(client)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            scenario.request(client)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'ms': round(min(timings), 2),
+        'queries': len(queries),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, latency_tolerance, memory_tolerance):
+    """Regressions of ``results`` against ``baseline`` (both {scenario: measurement}) as messages
+
+    Latency is only compared when ``latency_tolerance`` is not None.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['queries'] > previous['queries']:
+            regressions.append(f"{name}: {result['queries']} queries, baseline {previous['queries']}")
+        if latency_tolerance is not None and result['ms'] > previous['ms'] * (1 + latency_tolerance):
+            regressions.append(f"{name}: {result['ms']} ms, baseline {previous['ms']} ms")
+        if result['peak_kib'] > previous['peak_kib'] * (1 + memory_tolerance):
+            regressions.append(f"{name}: peak {result['peak_kib']} KiB, baseline {previous['peak_kib']} KiB")
+    return regressions
+
+
+# Code run in a fresh interpreter for each start-up target. A server imports
+# the URLconf, and with it every view module, on its first request.
+STARTUP_TARGETS = {
+    'manage.py check': "from django.core.management import execute_from_command_line\n"
+                       "execute_from_command_line(['manage.py', 'check', '--verbosity', '0'])",
+    'wsgi': "import viz_logs.wsgi\nfrom django.urls import get_resolver\nget_resolver().url_patterns",
+    'asgi': "import viz_logs.asgi\nfrom django.urls import get_resolver\nget_resolver().url_patterns",
+    # What the first PDF export adds on top of a booted worker
+    'wsgi+pdf': "import viz_logs.wsgi\nfrom django.urls import get_resolver\nget_resolver().url_patterns\n"
+                "import viz.reports",
+}
+
+# Appended to each target: reports peak RSS (KiB on Linux) and whether ReportLab got imported
+STARTUP_PROBE = """
+import json as _json, resource as _resource, sys as _sys
+print(_json.dumps({'rss': _resource.getrusage(_resource.RUSAGE_SELF).ru_maxrss,
+                   'reportlab': 'reportlab' in _sys.modules}))
+"""
+
+
+def measure_startup(code, repeat=3):
+    """Best wall time (ms) and peak RSS (MiB) of running ``code`` in a new interpreter
+
+    Wall time includes interpreter start-up, which is what a worker pays
+    too. Also reports whether ReportLab ended up imported.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'viz_logs.settings'))
+    timings, rss = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code + STARTUP_PROBE], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True)
+        timings.append((time.perf_counter() - started) * 1000)
+        if result.returncode:
+            raise RuntimeError(f"Start-up target failed:\n{result.stderr}")
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        rss.append(probe['rss'])
+    return {
+        'ms': round(min(timings), 1),
+        'rss_mib': round(min(rss) / 1024, 1),
+        'reportlab': probe['reportlab'],
+    }
@@ -0,0 +1,226 @@
+"""HTTP validators and the rendered table fragment cache
+
+viz_data rows are written once and never updated, so a row id identifies
+the content of that row and the newest row identifies the state of any
+listing built from the table, together with the data version that
+retention bumps when it moves old rows in or out.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag, urlencode
+from .filters import get_filter_params, filter_queryset, parse_day
+from .models import ArchivedReport, DataVersion, VizData
+from .pagination import apaginate, get_page_size
+from calendar import timegm
+from functools import wraps
+import hashlib
+import inspect
+
+# Bump when the markup or JSON of these responses changes, so clients drop what they hold
+RESPONSE_VERSION = 1
+DATA_VERSION_NAME = 'viz_data'
+
+
+def _latest_row_query():
+    state = DataVersion.objects.filter(name=DATA_VERSION_NAME)
+    return (VizData.objects.order_by('-id')
+            .annotate(data_version=Coalesce(Subquery(state.values('version')[:1]), Value(0)),
+                      last_modified=Greatest('created_at', Coalesce(Subquery(state.values('changed_at')[:1]),
+                                                                    'created_at')))
+            .values_list('id', 'last_modified', 'data_version'))
+
+
+def latest_row(request):
+    """(id, last modified, data version) of the newest viz_data row, looked up once per request
+
+    The last modification is the newest row's created_at, or the last time
+    rows were moved by retention if that is later.
+    """
+    if not hasattr(request, '_viz_latest_row'):
+        request._viz_latest_row = _latest_row_query().first() or (0, None, 0)
+    return request._viz_latest_row
+
+
+async def alatest_row(request):
+    """Async version of latest_row; both keep the result on the request"""
+    if not hasattr(request, '_viz_latest_row'):
+        request._viz_latest_row = await _latest_row_query().afirst() or (0, None, 0)
+    return request._viz_latest_row
+
+
+def bump_data_version():
+    """Move every listing validator and cached page on, in all processes, after rows were moved"""
+    now = timezone.now()
+    if not DataVersion.objects.filter(name=DATA_VERSION_NAME).update(version=F('version') + 1, changed_at=now):
+        DataVersion.objects.get_or_create(name=DATA_VERSION_NAME, defaults={'version': 1, 'changed_at': now})
+
+
+def _daily_report_query(request):
+    """ArchivedReport queryset for a single-day listing of all logos or one, or None for other listings"""
+    filters = get_filter_params(request.GET)
+    day = parse_day(filters['created_at'])
+    if day is None or any(filters[name] for name in ('search', 'group_id', 'date_from', 'date_to')):
+        return None
+    return ArchivedReport.objects.filter(day=day, sponsor_logo_name=filters['viz_name'])
+
+
+def daily_report(request):
+    """The pre-rendered report linked from a single-day listing, or None; looked up once per request"""
+    if not hasattr(request, '_viz_daily_report'):
+        reports = _daily_report_query(request)
+        request._viz_daily_report = reports.first() if reports is not None else None
+    return request._viz_daily_report
+
+
+async def adaily_report(request):
+    """Async version of daily_report"""
+    if not hasattr(request, '_viz_daily_report'):
+        reports = _daily_report_query(request)
+        request._viz_daily_report = await reports.afirst() if reports is not None else None
+    return request._viz_daily_report
+
+
+def _report_token(report):
+    # Each rendering saves the report and so moves generated_at
+    return f'{report.pk}.{report.generated_at.timestamp():.6f}'
+
+
+def normalised_query(query_dict):
+    """The query parameters sorted, without empty values, as a query string"""
+    return urlencode(sorted((key, value) for key, values in query_dict.lists() for value in values if value))
+
+
+def listing_etag(request, *args, **kwargs):
+    """ETag of a filtered listing: newest row id and data version plus the normalised query parameters"""
+    last_id, _, data_version = latest_row(request)
+    digest = hashlib.sha1(normalised_query(request.GET).encode()).hexdigest()[:16]
+    return f'v{RESPONSE_VERSION}-{data_version}-{last_id}-{digest}'
+
+
+async def alisting_etag(request, *args, **kwargs):
+    await alatest_row(request)
+    return listing_etag(request)
+
+
+def index_etag(request, *args, **kwargs):
+    """ETag of the index page: the listing's, plus the daily report it links to"""
+    report = daily_report(request)
+    return listing_etag(request) + (f'-r{_report_token(report)}' if report is not None else '')
+
+
+async def aindex_etag(request, *args, **kwargs):
+    await alatest_row(request)
+    await adaily_report(request)
+    return index_etag(request)
+
+
+async def alisting_last_modified(request, *args, **kwargs):
+    return (await alatest_row(request))[1]
+
+
+async def arow(request, pk):
+    """The viz_data row ``pk`` with visibility_map deferred, or None; looked up once per request"""
+    if not hasattr(request, '_viz_row'):
+        request._viz_row = await VizData.objects.defer('visibility_map').filter(pk=pk).afirst()
+    return request._viz_row
+
+
+async def arow_etag(request, pk):
+    """ETag of a single row's response, which never changes; None when there is no such row
+
+    Without a row the 404 gets no validator, so it is never answered with a 304.
+    """
+    if await arow(request, pk) is None:
+        return None
+    return f'v{RESPONSE_VERSION}-row-{pk}'
+
+
+def async_condition(etag_func=None, last_modified_func=None, cache_control=None):
+    """django.views.decorators.http.condition for async views
+
+    Django 4.2's condition and cache_control decorators only wrap sync
+    views. The validator functions may be sync or async; a matching request
+    gets its 304 (or 412) without the view running. ``cache_control``
+    directives are added to every response, 304s included.
+    """
+    async def resolve(func, request, *args, **kwargs):
+        if func is None:
+            return None
+        value = func(request, *args, **kwargs)
+        return await value if inspect.isawaitable(value) else value
+
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            etag = await resolve(etag_func, request, *args, **kwargs)
+            etag = quote_etag(etag) if etag else None
+            last_modified = await resolve(last_modified_func, request, *args, **kwargs)
+            last_modified = timegm(last_modified.utctimetuple()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            if cache_control:
+                patch_cache_control(response, **cache_control)
+            return response
+        return inner
+    return decorator
+
+
+def fragment_cache():
+    """The CACHES entry holding rendered table rows, or None when disabled"""
+    alias = getattr(settings, 'VIZ_FRAGMENT_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def _rows_cache_key(filters, cursor, page_size, last_id, data_version):
+    token = urlencode(sorted(filters.items())) + f'|{cursor or ""}|{page_size}|{last_id}|{data_version}'
+    return f'viz:rows:v{RESPONSE_VERSION}:' + hashlib.sha1(token.encode()).hexdigest()
+
+
+def _rows_fragment(rows, next_cursor):
+    return {
+        'html': render_to_string('viz/_rows.html', {'viz_data': rows}),
+        'count': len(rows),
+        'next_cursor': next_cursor,
+    }
+
+
+def _rows_request(request):
+    filters = {name: value.strip() for name, value in get_filter_params(request.GET).items()}
+    queryset = filter_queryset(VizData.objects.defer('visibility_map', 'histogram'), filters)
+    return filters, queryset, get_page_size(request.GET.get('page_size'))
+
+
+async def arendered_rows(request, cursor=None):
+    """One page of table rows for the request's filters: {'html', 'count', 'next_cursor'}
+
+    Pages are cached under the normalised filters, cursor and page size
+    plus the newest row id and data version, so a hit skips both the query
+    and the template loop, and any new row or archive run moves every
+    listing on to fresh keys; stale entries simply age out. Raises InvalidCursor like paginate.
+    """
+    filters, queryset, page_size = _rows_request(request)
+    cache = fragment_cache()
+    if cache is not None:
+        last_id, _, data_version = await alatest_row(request)
+        key = _rows_cache_key(filters, cursor, page_size, last_id, data_version)
+        fragment = await cache.aget(key)
+        if fragment is not None:
+            return fragment
+
+    # The deferred fields are never touched by the template, so rendering runs no queries
+    fragment = _rows_fragment(*await apaginate(queryset, cursor, page_size))
+    if cache is not None:
+        await cache.aset(key, fragment)
+    return fragment
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from django.conf import settings
+from .charts import CHART_STYLE_VERSION
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def chart_key(histogram_data):
+    """Content hash identifying the chart drawn for a histogram"""
+    payload = json.dumps([CHART_STYLE_VERSION, histogram_data['labels'], histogram_data['values']],
+                         separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class MemoryChartCache:
+    """In-process LRU of pickled chart drawings, bounded by total size"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class DiskChartCache:
+    """LRU of pickled chart drawings in a directory, shared by every worker on the host
+
+    Reads bump the file's mtime, and once the directory grows past
+    ``max_bytes`` the least recently used files are removed.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, f"{key}.pkl")
+
+    def get(self, key):
+        try:
+            with open(self._file(key), 'rb') as f:
+                data = f.read()
+            os.utime(self._file(key))
+            return data
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, data):
+        # Write under a temporary name so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._file(key))
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(entry.stat().st_size for entry in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.path) if entry.name.endswith('.pkl')]
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        self._size = sum(entry.stat().st_size for entry in entries)
+        # Trim to 90% so the next few writes don't each trigger a scan
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if self._size <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for entry in self._entries():
+            os.remove(entry.path)
+        with self._lock:
+            self._size = 0
+
+
+_chart_cache = None
+_chart_cache_lock = threading.Lock()
+
+
+def get_chart_cache():
+    """Return the configured chart cache, or None when VIZ_CHART_CACHE_BACKEND is None"""
+    global _chart_cache
+    backend = getattr(settings, 'VIZ_CHART_CACHE_BACKEND', 'memory')
+    if backend is None:
+        return None
+    with _chart_cache_lock:
+        if _chart_cache is None:
+            max_bytes = getattr(settings, 'VIZ_CHART_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+            if backend == 'disk':
+                path = getattr(settings, 'VIZ_CHART_CACHE_DIR', os.path.join(settings.BASE_DIR, 'chart_cache'))
+                _chart_cache = DiskChartCache(path, max_bytes)
+            else:
+                _chart_cache = MemoryChartCache(max_bytes)
+        return _chart_cache
+
+
+def load_chart(data):
+    # Each use gets its own copy, so a drawing is never shared between documents
+    return pickle.loads(data)
@@ -0,0 +1,51 @@
+"""MySQL backend that returns connections to a process-wide pool instead of closing them
+
+Django's persistent connections (CONN_MAX_AGE) belong to one thread, which
+does not fit ASGI: async ORM calls run on executor threads, so each request
+would open its own connection anyway. Here close() hands the MySQLdb
+connection to a pool shared by every thread and the next connect() reuses
+it, so keep CONN_MAX_AGE at 0 and let Django "close" after each request.
+
+Configured with OPTIONS['pool'] = {'max_size', 'timeout', 'max_idle',
+'max_lifetime'} (see viz.db.pool.ConnectionPool); reused connections are
+pinged first when CONN_HEALTH_CHECKS is on.
+"""
+from django.db.backends.mysql import base
+from viz.db.pool import ConnectionPool, PoolTimeout
+import threading
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    @property
+    def pool(self):
+        with _pools_lock:
+            pool = _pools.get(self.alias)
+            if pool is None:
+                params = self.get_connection_params()
+                pool = _pools[self.alias] = ConnectionPool(
+                    lambda: super(DatabaseWrapper, self).get_new_connection(params),
+                    check=self.settings_dict['CONN_HEALTH_CHECKS'],
+                    **self.settings_dict['OPTIONS'].get('pool', {}),
+                )
+            return pool
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.checkout()
+        except PoolTimeout as e:
+            raise base.Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.connection is not None:
+            # A connection dropped mid-transaction or after errors is not handed out again
+            with self.wrap_database_errors:
+                self.pool.checkin(self.connection, discard=self.in_atomic_block or self.errors_occurred)
@@ -0,0 +1,91 @@
+"""A thread-safe pool of DB-API connections shared by every thread of a process"""
+from collections import deque
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """At most ``max_size`` connections, handed out newest-idle first
+
+    Idle connections older than ``max_lifetime`` or idle for longer than
+    ``max_idle`` seconds are closed instead of being reused, and with
+    ``check`` a reused connection is pinged first. checkout() waits up to
+    ``timeout`` seconds for a free slot before raising PoolTimeout.
+    """
+
+    def __init__(self, connect, max_size=10, timeout=10, max_idle=300, max_lifetime=3600, check=True):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check = check
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._created = {}
+
+    def checkout(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection free after {self.timeout}s ({self.max_size} in use)")
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    break
+                connection, returned_at = entry
+                now = time.monotonic()
+                if (now - returned_at > self.max_idle or now - self._created[id(connection)] > self.max_lifetime
+                        or (self.check and not self._usable(connection))):
+                    self._discard(connection)
+                    continue
+                return connection
+
+            connection = self.connect()
+            self._created[id(connection)] = time.monotonic()
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def checkin(self, connection, discard=False):
+        """Give a connection back; rolled back first, and closed instead if ``discard`` or the rollback fails"""
+        try:
+            if not discard:
+                try:
+                    connection.rollback()
+                except Exception:
+                    discard = True
+            if discard:
+                self._discard(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close_idle(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def _discard(self, connection):
+        self._created.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _usable(connection):
+        try:
+            connection.ping()
+        except Exception:
+            return False
+        return True
@@ -0,0 +1,56 @@
+from .metrics import timer
+import json
+import struct
+
+# One histogram bin: upper bound of the bin (percent) and its share of the time (percent)
+HISTOGRAM_BIN = struct.Struct('<Hd')
+MAX_HISTOGRAM_BIN = 0xFFFF
+
+
+def normalise_visibility(visibility):
+    """Turn a raw {bin: seconds} visibility map into bin-sorted (bin, percent) pairs"""
+    bins = sorted((int(key), value) for key, value in visibility.items())
+    total = 0
+    for _, value in bins:
+        total += value
+    if total > 0:
+        bins = [(bin_num, round((value / total) * 100, 2)) for bin_num, value in bins]
+    return bins
+
+
+def load_visibility_map(raw):
+    """Parse a visibility_map JSON blob into a raw {bin: seconds} dict ({} when unreadable)"""
+    try:
+        with timer('json'):
+            visibility = json.loads(raw)
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return {}
+    return visibility if isinstance(visibility, dict) else {}
+
+
+def parse_visibility_map(raw):
+    """Parse a visibility_map JSON blob into normalised (bin, percent) pairs"""
+    try:
+        return normalise_visibility(load_visibility_map(raw))
+    except (TypeError, ValueError):
+        return []
+
+
+def encode_histogram(bins):
+    """Pack (bin, percent) pairs into the compact binary histogram format
+
+    Bins the format can't hold (outside 0..65535, from malformed legacy
+    visibility maps) are left out rather than failing the whole row.
+    """
+    return b''.join(HISTOGRAM_BIN.pack(bin_num, value) for bin_num, value in bins
+                    if 0 <= bin_num <= MAX_HISTOGRAM_BIN)
+
+
+def decode_histogram(blob):
+    """Unpack a binary histogram produced by encode_histogram"""
+    return list(HISTOGRAM_BIN.iter_unpack(bytes(blob)))
+
+
+def histogram_label(bin_num):
+    return f"{bin_num - 10} - {bin_num - 1 if bin_num < 100 else 100} %"
+
@@ -0,0 +1,21 @@
+"""Entry points for spawned export worker processes
+
+This module must stay importable before Django is set up: a spawned
+worker unpickles these functions first and only then runs init_worker.
+"""
+import importlib
+import os
+
+
+def init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    # Export workers only build reports, so preload viz.reports (and with it
+    # ReportLab) before the first job arrives
+    importlib.import_module('viz.reports')
+
+
+def run_export_job(job_id):
+    from .jobs import run_export_job
+    run_export_job(job_id)
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+import csv
+
+EXPORT_FIELDS = ('id', 'group_id', 'display_name', 'sponsor_logo_name', 'time_on_air', 'time_on_camera',
+                 'created_at', 'visibility_map')
+DEFAULT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-buffer whose write() hands the value back, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def iter_export_rows(queryset, chunk_size=None):
+    """Yield lists of row dicts from a VizData queryset, ordered by id
+
+    Each chunk is fetched with a keyset query (id greater than the last one
+    seen) rather than one long-running cursor: mysqlclient buffers a whole
+    result set client-side, so this is what keeps memory flat on MySQL.
+    """
+    chunk_size = chunk_size or getattr(settings, 'VIZ_EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    queryset = queryset.order_by('id').values(*EXPORT_FIELDS)
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+async def aiter_export_rows(queryset, chunk_size=None):
+    """Async version of iter_export_rows, using the async ORM"""
+    chunk_size = chunk_size or getattr(settings, 'VIZ_EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    queryset = queryset.order_by('id').values(*EXPORT_FIELDS)
+    last_id = 0
+    while True:
+        rows = [row async for row in queryset.filter(id__gt=last_id)[:chunk_size]]
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def _csv_rows(writer, rows):
+    return ''.join(writer.writerow([row[field] for field in EXPORT_FIELDS]) for row in rows)
+
+
+def _ndjson_rows(encoder, rows):
+    return ''.join(encoder.encode(row) + '\n' for row in rows)
+
+
+def csv_stream(queryset):
+    """Stream the rows of a queryset as CSV text, one chunk of rows per piece"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for rows in iter_export_rows(queryset):
+        yield _csv_rows(writer, rows)
+
+
+def ndjson_stream(queryset):
+    """Stream the rows of a queryset as newline-delimited JSON"""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for rows in iter_export_rows(queryset):
+        yield _ndjson_rows(encoder, rows)
+
+
+# ASGI servers only stream async iterators (Django buffers a sync one whole
+# before sending it), so the views pick these when served over ASGI.
+
+async def acsv_stream(queryset):
+    """Async version of csv_stream"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    async for rows in aiter_export_rows(queryset):
+        yield _csv_rows(writer, rows)
+
+
+async def andjson_stream(queryset):
+    """Async version of ndjson_stream"""
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    async for rows in aiter_export_rows(queryset):
+        yield _ndjson_rows(encoder, rows)
@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Max
+from django.db.models.functions import TruncDate
+from .models import VizData
+import threading
+import time
+
+DEFAULT_TTL = 300
+DEFAULT_CHECK_INTERVAL = 5
+SHARED_CACHE_KEY = 'viz:facets'
+
+
+class FacetCache:
+    """Process-local cache of the index dropdown values
+
+    The full set of group IDs, logo names and production days is built once
+    per TTL with DISTINCT queries (the day bucketing happens in the database).
+    In between, new rows are folded in incrementally: every few seconds the
+    highest row id is compared with the last one seen and only the rows
+    above it are read. When ``VIZ_FACET_CACHE_ALIAS`` names a Django cache,
+    the built facets are shared with other worker processes through it.
+    """
+
+    def __init__(self, ttl=None, check_interval=None, cache_alias=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'VIZ_FACET_TTL', DEFAULT_TTL)
+        self.check_interval = check_interval if check_interval is not None else getattr(
+            settings, 'VIZ_FACET_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+        self.cache_alias = cache_alias if cache_alias is not None else getattr(
+            settings, 'VIZ_FACET_CACHE_ALIAS', None)
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._group_ids = set()
+        self._viz_names = set()
+        self._dates = set()
+        self._watermark = None
+        self._expires_at = 0
+        self._checked_at = 0
+
+    @property
+    def shared_cache(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def get(self):
+        """Return the facets as sorted lists, refreshing them if needed"""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._expires_at:
+                if not self._load_shared():
+                    self._rebuild()
+                self._expires_at = now + self.ttl
+                self._checked_at = now
+            elif now - self._checked_at >= self.check_interval:
+                self._catch_up()
+                self._checked_at = now
+
+            return {
+                'group_ids': sorted(self._group_ids),
+                'viz_names': sorted(self._viz_names),
+                'dates': sorted(self._dates, reverse=True),
+            }
+
+    def record_rows(self, rows):
+        """Fold newly written rows into the cached facets without a query"""
+        with self._lock:
+            if self._watermark is None:
+                return
+            for row in rows:
+                self._add(row.group_id, row.sponsor_logo_name, row.created_at.date() if row.created_at else None)
+                if row.id and row.id > self._watermark:
+                    self._watermark = row.id
+            self._store_shared()
+
+    def invalidate(self):
+        """Drop the cached facets so the next call rebuilds them"""
+        with self._lock:
+            self._clear()
+            if self.shared_cache is not None:
+                self.shared_cache.delete(SHARED_CACHE_KEY)
+
+    def _add(self, group_id, viz_name, day):
+        if group_id is not None:
+            self._group_ids.add(group_id)
+        if viz_name is not None:
+            self._viz_names.add(viz_name)
+        if day is not None:
+            self._dates.add(day)
+
+    def _rebuild(self):
+        self._clear()
+        self._watermark = VizData.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        queryset = VizData.objects.filter(id__lte=self._watermark).order_by()
+        self._group_ids.update(queryset.values_list('group_id', flat=True).distinct())
+        self._viz_names.update(queryset.exclude(sponsor_logo_name=None)
+                               .values_list('sponsor_logo_name', flat=True).distinct())
+        self._dates.update(queryset.annotate(day=TruncDate('created_at'))
+                           .values_list('day', flat=True).distinct())
+        self._store_shared()
+
+    def _catch_up(self):
+        # Rows are append-only, so everything new sits above the watermark
+        new_rows = (VizData.objects.filter(id__gt=self._watermark).order_by()
+                    .annotate(day=TruncDate('created_at'))
+                    .values_list('id', 'group_id', 'sponsor_logo_name', 'day'))
+        for pk, group_id, viz_name, day in new_rows:
+            self._add(group_id, viz_name, day)
+            self._watermark = max(self._watermark, pk)
+        if new_rows:
+            self._store_shared()
+
+    def _load_shared(self):
+        if self.shared_cache is None:
+            return False
+        cached = self.shared_cache.get(SHARED_CACHE_KEY)
+        if cached is None:
+            return False
+        self._clear()
+        self._group_ids, self._viz_names, self._dates, self._watermark = cached
+        self._catch_up()
+        return True
+
+    def _store_shared(self):
+        if self.shared_cache is not None:
+            self.shared_cache.set(
+                SHARED_CACHE_KEY,
+                (self._group_ids, self._viz_names, self._dates, self._watermark),
+                self.ttl,
+            )
+
+
+facet_cache = FacetCache()
+
+
+def get_facets():
+    """Return the group IDs, logo names and production days for the index filters"""
+    return facet_cache.get()
+
+
+def rows_ingested_receiver(sender, rows, **kwargs):
+    facet_cache.record_rows(rows)
@@ -0,0 +1,61 @@
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from .search import apply_search
+
+FILTER_PARAMS = ('search', 'group_id', 'viz_name', 'created_at', 'date_from', 'date_to')
+
+
+def get_filter_params(query_dict):
+    """Read the index filter parameters from a GET/POST QueryDict"""
+    return {name: query_dict.get(name, '') for name in FILTER_PARAMS}
+
+
+def parse_day(value):
+    """The date of a "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS" value, or None if it is neither"""
+    for fmt in ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(value.strip(), fmt).date()
+        except ValueError:
+            pass
+    return None
+
+
+def day_start(day):
+    """Midnight at the start of ``day`` in the current time zone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_queryset(queryset, params):
+    """Apply the index filter parameters to a VizData queryset
+
+    Dates select whole days in the current time zone: created_at picks one
+    day and date_from/date_to an inclusive range of days. Each becomes a
+    half-open created_at range rather than a function of the column, so the
+    created_at indexes apply. Values that aren't dates are ignored.
+    """
+    search = params.get('search', '')
+    group_id_filter = params.get('group_id', '')
+    viz_name_filter = params.get('viz_name', '')
+
+    if search:
+        queryset = apply_search(queryset, search)
+
+    if group_id_filter:
+        queryset = queryset.filter(group_id=group_id_filter)
+
+    if viz_name_filter:
+        queryset = queryset.filter(sponsor_logo_name=viz_name_filter)
+
+    day = parse_day(params.get('created_at', ''))
+    if day:
+        queryset = queryset.filter(created_at__gte=day_start(day), created_at__lt=day_start(day + timedelta(days=1)))
+
+    date_from = parse_day(params.get('date_from', ''))
+    if date_from:
+        queryset = queryset.filter(created_at__gte=day_start(date_from))
+
+    date_to = parse_day(params.get('date_to', ''))
+    if date_to:
+        queryset = queryset.filter(created_at__lt=day_start(date_to + timedelta(days=1)))
+
+    return queryset
@@ -0,0 +1,151 @@
+from django.conf import settings
+from django.db import transaction
+from .metrics import timer
+from .models import VizData
+from .signals import rows_ingested
+import json
+import math
+import time
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+VISIBILITY_MAP_MAX_LENGTH = 16383
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def _text(record, name, max_length, required=False):
+    value = record.get(name)
+    if value is None or value == '':
+        if required:
+            raise InvalidRecord(f"{name} is required")
+        return None
+    if not isinstance(value, str):
+        raise InvalidRecord(f"{name} must be a string")
+    if len(value) > max_length:
+        raise InvalidRecord(f"{name} is longer than {max_length} characters")
+    return value
+
+
+def _is_seconds(value):
+    """Whether value is a finite, non-negative JSON number (and not a bool)"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    try:
+        return math.isfinite(value) and value >= 0
+    except OverflowError:
+        # An integer too large for a float
+        return False
+
+
+def _seconds(record, name):
+    value = record.get(name)
+    if value is None:
+        return None
+    if not _is_seconds(value):
+        raise InvalidRecord(f"{name} must be a non-negative number")
+    return float(value)
+
+
+def normalise_visibility_map(value):
+    """Validate a visibility map and return its canonical JSON text
+
+    Accepts a dict or its JSON text. Keys must be integer bins between 0
+    and 100 and values non-negative numbers; the result has keys sorted
+    by bin and no whitespace.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            raise InvalidRecord("visibility_map is not valid JSON")
+    if not isinstance(value, dict):
+        raise InvalidRecord("visibility_map must be an object")
+
+    bins = {}
+    for key, seconds in value.items():
+        try:
+            bin_num = int(key)
+        except (TypeError, ValueError):
+            raise InvalidRecord(f"visibility_map bin {key!r} is not an integer")
+        if not 0 <= bin_num <= 100:
+            raise InvalidRecord(f"visibility_map bin {bin_num} is outside 0-100")
+        if not _is_seconds(seconds):
+            raise InvalidRecord(f"visibility_map value for bin {bin_num} must be a non-negative number")
+        bins[bin_num] = bins.get(bin_num, 0) + seconds
+
+    text = json.dumps({str(bin_num): bins[bin_num] for bin_num in sorted(bins)}, separators=(',', ':'))
+    if len(text) > VISIBILITY_MAP_MAX_LENGTH:
+        raise InvalidRecord("visibility_map is too large")
+    return text
+
+
+def build_row(record):
+    """Turn one decoded JSON record into an unsaved VizData row with its histogram"""
+    if not isinstance(record, dict):
+        raise InvalidRecord("record must be a JSON object")
+    row = VizData(
+        group_id=_text(record, 'group_id', 50, required=True),
+        display_name=_text(record, 'display_name', 255),
+        sponsor_logo_name=_text(record, 'sponsor_logo_name', 255),
+        time_on_air=_seconds(record, 'time_on_air'),
+        time_on_camera=_seconds(record, 'time_on_camera'),
+        visibility_map=normalise_visibility_map(record.get('visibility_map', {})),
+    )
+    row.refresh_histogram()
+    return row
+
+
+def _write_chunk(rows):
+    with transaction.atomic():
+        VizData.objects.bulk_create(rows)
+    rows_ingested.send(sender=VizData, rows=rows)
+
+
+def ingest_lines(lines, chunk_size=None):
+    """Validate and insert JSON-lines records, one transaction per chunk
+
+    ``lines`` is any iterable of bytes or str lines (such as the request
+    itself), so a batch is never held in memory all at once. Invalid
+    records are skipped and reported; valid ones are written with
+    bulk_create. Returns the batch statistics.
+    """
+    chunk_size = chunk_size or getattr(settings, 'VIZ_INGEST_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    started = time.perf_counter()
+    stats = {'received': 0, 'inserted': 0, 'rejected': 0, 'chunks': 0, 'errors': []}
+    pending = []
+
+    for line_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.strip():
+            continue
+        stats['received'] += 1
+        try:
+            with timer('json'):
+                record = json.loads(line)
+            pending.append(build_row(record))
+        # InvalidRecord, JSONDecodeError and integers past Python's digit limit are all ValueErrors
+        except ValueError as e:
+            stats['rejected'] += 1
+            if len(stats['errors']) < MAX_REPORTED_ERRORS:
+                stats['errors'].append({'line': line_number, 'error': str(e)})
+            continue
+
+        if len(pending) >= chunk_size:
+            _write_chunk(pending)
+            stats['inserted'] += len(pending)
+            stats['chunks'] += 1
+            pending = []
+
+    if pending:
+        _write_chunk(pending)
+        stats['inserted'] += len(pending)
+        stats['chunks'] += 1
+
+    elapsed = time.perf_counter() - started
+    stats['elapsed_ms'] = round(elapsed * 1000, 1)
+    stats['rows_per_second'] = round(stats['inserted'] / elapsed) if elapsed > 0 else stats['inserted']
+    return stats
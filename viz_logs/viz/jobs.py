@@ -0,0 +1,129 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils import timezone
+from datetime import timedelta
+from .models import VizData, ExportJob
+from .aggregation import combined_logo_time
+from . import export_worker
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_export_dir():
+    path = getattr(settings, 'VIZ_EXPORT_DIR', os.path.join(settings.BASE_DIR, 'exports'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_executor():
+    """Return the process-wide export pool, creating it on first use
+
+    ``VIZ_EXPORT_EXECUTOR`` picks ``'thread'`` (default) or ``'process'``;
+    process workers are spawned rather than forked so they never share the
+    parent's database connections.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = getattr(settings, 'VIZ_EXPORT_WORKERS', 2)
+            if getattr(settings, 'VIZ_EXPORT_EXECUTOR', 'thread') == 'process':
+                _executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=export_worker.init_worker,
+                    initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'viz_logs.settings'),),
+                )
+            else:
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='viz-export')
+        return _executor
+
+
+def submit_export(selected_ids):
+    """Create an export job for the given row ids and queue it on the worker pool"""
+    purge_expired_jobs()
+    job = ExportJob.objects.create(selected_ids=selected_ids)
+    executor = get_executor()
+    if isinstance(executor, ProcessPoolExecutor):
+        executor.submit(export_worker.run_export_job, job.pk)
+    else:
+        executor.submit(run_export_job, job.pk)
+    return job
+
+
+def run_export_job(job_id):
+    """Render the report of one export job to a file, recording progress on the job row"""
+    # Imported here so web workers that never export don't load ReportLab
+    from .reports import build_report
+    close_old_connections()
+    try:
+        job = ExportJob.objects.get(pk=job_id)
+        # Every transition is conditional on the current status, so a job fail_if_stale
+        # already gave up on stays failed when a slow worker gets to it or finishes it
+        if not ExportJob.objects.filter(pk=job_id, status=ExportJob.PENDING).update(status=ExportJob.RUNNING):
+            return
+        running = ExportJob.objects.filter(pk=job_id, status=ExportJob.RUNNING)
+
+        # Persist progress at most every half second and only when it moved
+        last = {'progress': 0, 'time': 0}
+        def progress(fraction):
+            percent = int(fraction * 100)
+            now = time.monotonic()
+            if percent > last['progress'] and now - last['time'] >= 0.5:
+                running.update(progress=percent)
+                last.update(progress=percent, time=now)
+
+        selected = VizData.objects.filter(id__in=job.selected_ids)
+        items = list(selected.order_by('-created_at'))
+        file_path = os.path.join(get_export_dir(), f"{job.pk}.pdf")
+        build_report(items, combined_logo_time(selected), file_path, progress=progress)
+
+        if not running.update(status=ExportJob.DONE, progress=100, file_path=file_path, finished_at=timezone.now()):
+            # Timed out meanwhile; nothing will ever download or purge this file
+            os.remove(file_path)
+    except Exception as e:
+        logger.exception("Export job %s failed", job_id)
+        ExportJob.objects.filter(pk=job_id, status=ExportJob.RUNNING).update(
+            status=ExportJob.FAILED, error=str(e), finished_at=timezone.now())
+    finally:
+        connections.close_all()
+
+
+def get_export_timeout():
+    return getattr(settings, 'VIZ_EXPORT_TIMEOUT_SECONDS', 600)
+
+
+def fail_if_stale(job):
+    """Mark a job failed if it has been pending or running for longer than VIZ_EXPORT_TIMEOUT_SECONDS
+
+    Jobs run in the web worker's own pool, so a worker restart or deploy
+    drops them without anything recording the failure.
+    """
+    if job.status not in (ExportJob.PENDING, ExportJob.RUNNING):
+        return job
+    if job.created_at >= timezone.now() - timedelta(seconds=get_export_timeout()):
+        return job
+    ExportJob.objects.filter(pk=job.pk, status__in=(ExportJob.PENDING, ExportJob.RUNNING)).update(
+        status=ExportJob.FAILED, error='Export timed out', finished_at=timezone.now())
+    job.refresh_from_db()
+    return job
+
+
+def purge_expired_jobs():
+    """Delete jobs, and their files, older than VIZ_EXPORT_RETENTION_HOURS"""
+    hours = getattr(settings, 'VIZ_EXPORT_RETENTION_HOURS', 24)
+    expired = ExportJob.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours))
+    for file_path in expired.exclude(file_path='').values_list('file_path', flat=True):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+    expired.delete()
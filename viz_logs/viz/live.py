@@ -0,0 +1,167 @@
+"""Server-sent events pushing newly written rows to open index pages
+
+A single ChangeWatcher per process polls MAX(id) and wakes every
+subscriber when it moves, so the steady-state cost is one primary key
+lookup per interval however many pages are open. Only then does each
+subscriber query the new id range with its own filters.
+
+Their queries run in short-lived sync calls that close the connection
+afterwards, so a stream open for minutes doesn't keep one checked out.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.template.loader import render_to_string
+from . import metrics
+from .filters import filter_queryset
+from .models import VizData
+import asyncio
+import json
+import time
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_STREAM_SECONDS = 300
+DEFAULT_HEARTBEAT_SECONDS = 15
+
+
+class ChangeWatcher:
+    """Tracks the newest viz_data id for all subscribers of one event loop
+
+    The polling task only runs while somebody is subscribed. Rows ingested
+    by this process wake it at once instead of at the next poll.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self.last_id = None
+        self.subscribers = 0
+        self._loop = None
+        self._task = None
+        self._changed = None
+        self._wake = None
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._task = None
+            self._changed = asyncio.Event()
+            self._wake = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._poll())
+
+    async def _poll(self):
+        # The task inherits the context of the request that started it; its queries are nobody's
+        metrics.clear()
+        interval = self.interval or getattr(settings, 'VIZ_LIVE_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        while self.subscribers:
+            newest = await anewest_id()
+            if newest != self.last_id:
+                self.last_id = newest
+                changed, self._changed = self._changed, asyncio.Event()
+                changed.set()
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def wait(self, after_id, timeout):
+        """Wait up to ``timeout`` seconds for rows newer than after_id; returns the newest id known"""
+        self._ensure_running()
+        if self.last_id is not None and self.last_id > after_id:
+            return self.last_id
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.last_id if self.last_id is not None else after_id
+
+    def notify(self):
+        """Wake the polling task from any thread"""
+        if self._loop is not None and self._wake is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+
+watcher = ChangeWatcher()
+
+
+def rows_ingested_receiver(sender, rows, **kwargs):
+    watcher.notify()
+
+
+def released(query):
+    """Async wrapper running a sync ORM call on a thread of its own, closing its connection after
+
+    The async ORM keeps its connection until the request ends, which for a
+    live stream (or the watcher, which outlives any request) is far too
+    long; closing hands a pooled connection straight back.
+    """
+    def run(*args, **kwargs):
+        try:
+            return query(*args, **kwargs)
+        finally:
+            connection.close()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def newest_id():
+    return VizData.objects.aggregate(newest=Max('id'))['newest'] or 0
+
+
+def rows_after(filters, after_id, up_to_id=None):
+    """The next batch of rows newer than after_id matching the filters, ordered by id"""
+    batch_size = getattr(settings, 'VIZ_LIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    queryset = VizData.objects.defer('visibility_map', 'histogram').filter(id__gt=after_id)
+    if up_to_id is not None:
+        queryset = queryset.filter(id__lte=up_to_id)
+    queryset = filter_queryset(queryset, filters).order_by('id')
+    return list(queryset[:batch_size])
+
+
+anewest_id = released(newest_id)
+arows_after = released(rows_after)
+
+
+def rows_event(rows):
+    """An SSE 'rows' event with the rendered rows, newest first; its id is the newest row id"""
+    payload = json.dumps({
+        'html': render_to_string('viz/_rows.html', {'viz_data': rows[::-1]}),
+        'count': len(rows),
+    })
+    return f"id: {rows[-1].id}\nevent: rows\ndata: {payload}\n\n"
+
+
+def retry_field():
+    return f"retry: {getattr(settings, 'VIZ_LIVE_RETRY_MS', 3000)}\n\n"
+
+
+async def event_stream(filters, after_id):
+    """Push rows newer than after_id as they arrive, for at most VIZ_LIVE_STREAM_SECONDS
+
+    The stream then ends and the browser reconnects with Last-Event-ID, which
+    bounds how long a stream for a client that went away can linger.
+    """
+    deadline = time.monotonic() + getattr(settings, 'VIZ_LIVE_STREAM_SECONDS', DEFAULT_STREAM_SECONDS)
+    heartbeat = getattr(settings, 'VIZ_LIVE_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+    watcher.subscribers += 1
+    try:
+        yield retry_field()
+        while (remaining := deadline - time.monotonic()) > 0:
+            newest = await watcher.wait(after_id, min(heartbeat, remaining))
+            if newest <= after_id:
+                # Comment line, keeps proxies from closing an idle connection
+                yield ': keepalive\n\n'
+                continue
+            rows = await arows_after(filters, after_id, newest)
+            if rows:
+                yield rows_event(rows)
+                after_id = rows[-1].id
+            if len(rows) < getattr(settings, 'VIZ_LIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE):
+                # Nothing else up to newest matches these filters
+                after_id = newest
+    finally:
+        watcher.subscribers -= 1
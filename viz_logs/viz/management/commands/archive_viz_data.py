@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from viz.retention import archive_cutoff, archive_old_rows, months_to_archive, parse_month, restore_month
+
+
+class Command(BaseCommand):
+    help = ('Move viz_data rows from months before the retention window to the compressed, '
+            'month-partitioned viz_data_archive table, or move an archived month back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int, default=None,
+                            help='Whole months kept in viz_data besides the current one '
+                                 '(default VIZ_ARCHIVE_KEEP_MONTHS)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows moved per transaction (default VIZ_ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the months that would be archived')
+        parser.add_argument('--restore', metavar='YYYY-MM',
+                            help='Move this archived month back into viz_data instead')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            try:
+                month = parse_month(options['restore'])
+            except ValueError:
+                raise CommandError('--restore must be a month like 2025-01')
+            moved = restore_month(month, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Restored {moved} rows from {month:%Y-%m}"))
+            return
+
+        cutoff = archive_cutoff(options['keep_months'])
+        if options['dry_run']:
+            for month, rows in months_to_archive(cutoff).items():
+                self.stdout.write(f"{month:%Y-%m}: {rows} rows")
+            self.stdout.write(f"Rows created before {cutoff} would be archived")
+            return
+
+        moved = archive_old_rows(options['keep_months'], options['batch_size'],
+                                 progress=lambda month, rows: self.stdout.write(f"{month:%Y-%m}: {rows} rows"))
+        self.stdout.write(self.style.SUCCESS(f"Archived {sum(moved.values())} rows created before {cutoff}"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from viz.models import VizData
+
+
+class Command(BaseCommand):
+    help = 'Precompute the histogram column for viz_data rows written before it existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of rows read and updated per batch')
+        parser.add_argument('--all', action='store_true',
+                            help='Recompute every row, not only rows without a histogram')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = VizData.objects.only('id', 'visibility_map').order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(histogram__isnull=True)
+
+        last_id = 0
+        updated = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            for item in batch:
+                item.refresh_histogram()
+            VizData.objects.bulk_update(batch, ['histogram'])
+            last_id = batch[-1].id
+            updated += len(batch)
+            self.stdout.write(f"Updated {updated} rows (last id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled histograms for {updated} rows"))
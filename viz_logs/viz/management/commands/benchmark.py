@@ -0,0 +1,113 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment, override_settings
+from viz.benchmarks import build_dataset, scenarios, measure, compare
+from viz.facets import facet_cache
+import json
+import os
+import time
+
+DEFAULT_BASELINES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'benchmark_baselines.json')
+
+
+class Command(BaseCommand):
+    help = ('Measure latency, query count and peak memory of the dashboard views on synthetic '
+            'viz_data tables in a throwaway test database, and fail on query count or memory regressions '
+            'against stored baselines (latency too with --check-latency, against baselines recorded on this host)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000',
+                            help='Comma separated row counts to build, e.g. 10000,100000,1000000')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed runs per scenario; the best time is reported')
+        parser.add_argument('--only', default='',
+                            help='Only run scenarios whose name starts with this')
+        parser.add_argument('--baselines', default=DEFAULT_BASELINES,
+                            help='JSON file of baseline results, keyed by database vendor and size')
+        parser.add_argument('--update-baselines', action='store_true',
+                            help='Store these results as the new baselines instead of comparing')
+        parser.add_argument('--check-latency', action='store_true',
+                            help='Also fail on latency regressions. Baseline milliseconds only mean something on '
+                                 'the host that recorded them, so record them there first with --update-baselines')
+        parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                            help='Allowed latency increase over the baseline with --check-latency, as a fraction')
+        parser.add_argument('--memory-tolerance', type=float, default=0.25,
+                            help='Allowed peak memory increase over the baseline, as a fraction')
+        parser.add_argument('--noinput', action='store_false', dest='interactive',
+                            help='Drop a leftover test database without asking')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',') if size]
+        except ValueError:
+            raise CommandError('--sizes must be comma separated integers')
+
+        baselines = {}
+        if os.path.exists(options['baselines']):
+            with open(options['baselines']) as f:
+                baselines = json.load(f)
+
+        # viz_data is built from the model rather than by migrations (see viz.benchmarks.create_table)
+        connection.settings_dict['TEST']['MIGRATE'] = False
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=not options['interactive'],
+                                                      serialize=False)
+        setup_test_environment()
+        regressions = self.regressions = []
+        try:
+            for size in sizes:
+                key = f"{connection.vendor}/{size}"
+                results = self.run_size(size, options)
+                if options['update_baselines']:
+                    baselines.setdefault(key, {}).update(results)
+                else:
+                    regressions += [f"[{key}] {message}" for message in
+                                    compare(results, baselines.get(key, {}),
+                                            options['latency_tolerance'] if options['check_latency'] else None,
+                                            options['memory_tolerance'])]
+        finally:
+            teardown_test_environment()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['update_baselines']:
+            with open(options['baselines'], 'w') as f:
+                json.dump(baselines, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Baselines written to {options['baselines']}"))
+        elif regressions:
+            raise CommandError('Regressions:\n  ' + '\n  '.join(regressions))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def run_size(self, size, options):
+        started = time.perf_counter()
+        values = build_dataset(size)
+        facet_cache.invalidate()
+        self.stdout.write(f"\n{size} rows on {connection.vendor} (built in {time.perf_counter() - started:.1f}s)")
+        # The data does not change while measuring, so keep the periodic facet
+        # refresh queries from landing in random runs. Warm runs would only
+        # measure the fragment and chart caches, so both are off to keep the
+        # query, template and chart work in the figures.
+        refresh = facet_cache.ttl, facet_cache.check_interval
+        facet_cache.ttl = facet_cache.check_interval = float('inf')
+        try:
+            with override_settings(VIZ_FRAGMENT_CACHE_ALIAS=None, VIZ_CHART_CACHE_BACKEND=None):
+                return self.run_scenarios(size, values, options)
+        finally:
+            facet_cache.ttl, facet_cache.check_interval = refresh
+
+    def run_scenarios(self, size, values, options):
+        self.stdout.write(f"  {'scenario':<40} {'ms':>10} {'queries':>8} {'peak KiB':>10}")
+        client = Client()
+        results = {}
+        for scenario in scenarios(values):
+            if not scenario.name.startswith(options['only']):
+                continue
+            result = results[scenario.name] = measure(scenario, client, options['repeat'])
+            line = f"  {scenario.name:<40} {result['ms']:>10} {result['queries']:>8} {result['peak_kib']:>10}"
+            if result['queries'] > scenario.max_queries:
+                line += self.style.ERROR(f"  over the {scenario.max_queries} query budget")
+                self.regressions.append(f"[{connection.vendor}/{size}] {scenario.name}: {result['queries']} queries, "
+                                        f"budget {scenario.max_queries}")
+            self.stdout.write(line)
+        return results
@@ -0,0 +1,73 @@
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils import timezone
+from io import BytesIO
+from viz.models import VizData
+from viz.reports import build_report
+import json
+import multiprocessing
+import os
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compare serial and parallel wall time of building the per-row PDF report pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=200,
+                            help='Number of synthetic rows in the report')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes in the parallel render pool')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Runs per mode; the best time is reported')
+
+    def handle(self, *args, **options):
+        # Without the chart cache every run renders every chart, instead of all but the first hitting it
+        # The worker count also sizes the chunks handed to the pool
+        with override_settings(VIZ_CHART_CACHE_BACKEND=None, VIZ_REPORT_RENDER_WORKERS=options['workers']):
+            self.compare(options)
+
+    def compare(self, options):
+        items = self.synthetic_items(options['items'])
+
+        serial = self.best_time(items, False, options['repeat'])
+        self.stdout.write(f"serial:   {serial:.3f}s")
+
+        pool = ProcessPoolExecutor(max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'))
+        try:
+            # Warm the pool up so worker start-up is not counted
+            build_report(items[:options['workers']], [], BytesIO(), pool=pool)
+            parallel = self.best_time(items, pool, options['repeat'])
+        finally:
+            pool.shutdown()
+        self.stdout.write(f"parallel: {parallel:.3f}s ({options['workers']} workers)")
+        self.stdout.write(self.style.SUCCESS(f"speedup:  {serial / parallel:.2f}x"))
+
+    def best_time(self, items, pool, repeat):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            build_report(items, [], BytesIO(), pool=pool)
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    def synthetic_items(self, count):
+        rng = random.Random(0)
+        now = timezone.now()
+        items = []
+        for i in range(count):
+            item = VizData(
+                id=i + 1,
+                group_id=f"CAM{i % 12}",
+                display_name=f"Camera {i % 12}",
+                sponsor_logo_name=f"Logo {i % 30}",
+                time_on_air=rng.uniform(0, 3600),
+                time_on_camera=rng.uniform(0, 3600),
+                visibility_map=json.dumps({str(b): rng.randint(0, 600) for b in range(10, 101, 10)}),
+                created_at=now,
+            )
+            item.refresh_histogram()
+            items.append(item)
+        return items
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from viz.benchmarks import STARTUP_TARGETS, measure_startup
+
+
+class Command(BaseCommand):
+    help = ('Measure wall time and peak RSS of booting the project in a fresh interpreter: '
+            'manage.py, a WSGI or ASGI worker up to its first request, and the first PDF export')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per target; the best time is reported')
+        parser.add_argument('--only', default='',
+                            help='Only run targets whose name starts with this')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"  {'target':<20} {'ms':>8} {'RSS MiB':>8}  reportlab")
+        for name, code in STARTUP_TARGETS.items():
+            if not name.startswith(options['only']):
+                continue
+            result = measure_startup(code, options['repeat'])
+            loaded = 'loaded' if result['reportlab'] else '-'
+            self.stdout.write(f"  {name:<20} {result['ms']:>8} {result['rss_mib']:>8}  {loaded}")
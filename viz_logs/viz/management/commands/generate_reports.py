@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from datetime import datetime, timedelta
+from viz.report_archive import generate_day_reports
+
+
+class Command(BaseCommand):
+    help = ('Pre-render the daily PDF reports (all logos and one per sponsor logo) served from the '
+            'report archive; meant to run off-peak from cron, by default for yesterday')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Last day to render, YYYY-MM-DD (default yesterday)')
+        parser.add_argument('--days', type=int, default=1,
+                            help='Number of days to render, ending with --date')
+        parser.add_argument('--no-per-logo', action='store_false', dest='per_logo',
+                            help='Only render the all-logos report of each day')
+        parser.add_argument('--force', action='store_true',
+                            help='Render again even if the day has not changed since the last run')
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                last_day = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+        else:
+            last_day = timezone.localdate() - timedelta(days=1)
+
+        def progress(report, rendered):
+            state = 'rendered' if rendered else 'up to date'
+            self.stdout.write(f"{report.day} {report.sponsor_logo_name or '(all logos)'}: "
+                              f"{report.row_count} rows, {state}")
+
+        rendered = 0
+        for offset in range(options['days'] - 1, -1, -1):
+            rendered += generate_day_reports(last_day - timedelta(days=offset), options['per_logo'],
+                                             options['force'], progress)
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} reports"))
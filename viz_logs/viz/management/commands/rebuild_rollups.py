@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from viz.rollups import rebuild_rollups, update_rollups
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the daily and hourly exposure rollups from viz_data. Run with --incremental from cron '
+            'to keep the summary endpoints current')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only fold in rows settled since the last update instead of rebuilding')
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            processed = update_rollups()
+        else:
+            processed = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {processed} rows"))
@@ -0,0 +1,167 @@
+"""Per-request timings and process-wide counters, exported in Prometheus text format
+
+Each process keeps its own counters (no external services), so with several
+gunicorn workers every scrape of /metrics sees the worker that served it.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+import time
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_current = ContextVar('viz_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Measurements gathered while one request is handled"""
+
+    def __init__(self, capture_sql=False):
+        self.started = time.perf_counter()
+        self.timings = {}
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.capture_sql = capture_sql
+        self.queries = []
+
+    def add_time(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def record_query(self, sql, seconds):
+        self.db_queries += 1
+        self.db_time += seconds
+        if self.capture_sql:
+            self.queries.append((sql, seconds))
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def start_request(capture_sql=False):
+    metrics = RequestMetrics(capture_sql)
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+def clear():
+    """Stop attributing work in this context (such as a background task) to a request"""
+    _current.set(None)
+
+
+@contextmanager
+def timer(name):
+    """Add the time spent in the block to the current request's ``name`` timing"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(name, time.perf_counter() - started)
+
+
+def query_timer(execute, sql, params, many, context):
+    """Execute wrapper counting and timing the current request's queries
+
+    Installed on every connection (see install_query_timer) rather than per
+    request, because async views run their queries on other threads, which
+    see the request's metrics through the context variable but not a
+    connection wrapped in the request's own thread.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver adding query_timer to a new database connection"""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+class Registry:
+    """Process-wide per-view counters and request duration histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = {}
+        self.durations = {}
+        self.totals = {}
+
+    def observe(self, view, method, status, metrics, response_bytes):
+        duration = metrics.elapsed
+        with self._lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+            histogram = self.durations.setdefault(view, {'buckets': [0] * len(DURATION_BUCKETS), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += duration
+            histogram['count'] += 1
+
+            totals = self.totals.setdefault(view, {})
+            for name, value in (('db_queries', metrics.db_queries), ('db_seconds', metrics.db_time),
+                                ('response_bytes', response_bytes or 0),
+                                *((f'{name}_seconds', seconds) for name, seconds in metrics.timings.items())):
+                totals[name] = totals.get(name, 0) + value
+
+    def add_response_bytes(self, view, size):
+        with self._lock:
+            totals = self.totals.setdefault(view, {})
+            totals['response_bytes'] = totals.get('response_bytes', 0) + size
+
+    def render(self):
+        """The counters in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines.append('# HELP viz_requests_total Requests handled, by view, method and status.')
+            lines.append('# TYPE viz_requests_total counter')
+            for (view, method, status), count in sorted(self.requests.items()):
+                lines.append(f'viz_requests_total{{view="{_escape(view)}",method="{method}",status="{status}"}} {count}')
+
+            lines.append('# HELP viz_request_duration_seconds Wall time spent handling requests, by view.')
+            lines.append('# TYPE viz_request_duration_seconds histogram')
+            for view, histogram in sorted(self.durations.items()):
+                label = _escape(view)
+                for bound, count in zip(DURATION_BUCKETS, histogram['buckets']):
+                    lines.append(f'viz_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {count}')
+                lines.append(f'viz_request_duration_seconds_bucket{{view="{label}",le="+Inf"}} {histogram["count"]}')
+                lines.append(f'viz_request_duration_seconds_sum{{view="{label}"}} {histogram["sum"]:.6f}')
+                lines.append(f'viz_request_duration_seconds_count{{view="{label}"}} {histogram["count"]}')
+
+            names = sorted({name for totals in self.totals.values() for name in totals})
+            for name in names:
+                metric = f'viz_{name}_total'
+                lines.append(f'# HELP {metric} Sum of {name.replace("_", " ")} over all requests, by view.')
+                lines.append(f'# TYPE {metric} counter')
+                for view, totals in sorted(self.totals.items()):
+                    if name in totals:
+                        lines.append(f'{metric}{{view="{_escape(view)}"}} {totals[name]:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
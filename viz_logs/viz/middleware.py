@@ -0,0 +1,112 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from . import metrics
+import logging
+import random
+
+slow_logger = logging.getLogger('viz.slow')
+
+# Server-Timing entries for the named timers, in header order
+SERVER_TIMING_DESCRIPTIONS = {
+    'json': 'JSON parsing',
+    'pdf': 'PDF build',
+}
+
+
+class RequestMetricsMiddleware:
+    """Time every request, count its queries and publish the numbers
+
+    Adds a Server-Timing header (total, db, and any json/pdf timers) to each
+    response, feeds the per-view counters served at /metrics and, when
+    VIZ_SLOW_REQUEST_MS is set, logs a sample of slow requests with their SQL
+    to the ``viz.slow`` logger. Queries are counted by metrics.query_timer,
+    which VizConfig installs on every database connection. Works in both
+    sync and async stacks.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'VIZ_SLOW_REQUEST_MS', None)
+        self.sample_rate = getattr(settings, 'VIZ_SLOW_REQUEST_SAMPLE_RATE', 1.0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request_metrics, token = metrics.start_request(capture_sql=self.slow_ms is not None)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.record(request, response, request_metrics)
+
+    async def __acall__(self, request):
+        request_metrics, token = metrics.start_request(capture_sql=self.slow_ms is not None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.record(request, response, request_metrics)
+
+    def record(self, request, response, request_metrics):
+        view = self.view_name(request)
+        if response.streaming:
+            # The body is produced after we return, so its size is counted as it goes out
+            counter = self.acount_streamed if response.is_async else self.count_streamed
+            response.streaming_content = counter(view, response.streaming_content)
+            size = 0
+        else:
+            size = len(response.content)
+
+        response['Server-Timing'] = self.server_timing(request_metrics)
+        metrics.registry.observe(view, request.method, response.status_code, request_metrics, size)
+        self.log_if_slow(request, view, response, request_metrics)
+        return response
+
+    @staticmethod
+    def view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match else 'unresolved'
+
+    @staticmethod
+    def server_timing(request_metrics):
+        entries = [f'total;dur={request_metrics.elapsed * 1000:.1f}',
+                   f'db;dur={request_metrics.db_time * 1000:.1f};desc="{request_metrics.db_queries} queries"']
+        for name, description in SERVER_TIMING_DESCRIPTIONS.items():
+            if name in request_metrics.timings:
+                entries.append(f'{name};dur={request_metrics.timings[name] * 1000:.1f};desc="{description}"')
+        return ', '.join(entries)
+
+    @staticmethod
+    def count_streamed(view, content):
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            metrics.registry.add_response_bytes(view, size)
+
+    @staticmethod
+    async def acount_streamed(view, content):
+        size = 0
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            metrics.registry.add_response_bytes(view, size)
+
+    def log_if_slow(self, request, view, response, request_metrics):
+        elapsed_ms = request_metrics.elapsed * 1000
+        if self.slow_ms is None or elapsed_ms < self.slow_ms or random.random() >= self.sample_rate:
+            return
+        queries = '\n'.join(f'  {seconds * 1000:.1f} ms  {sql}' for sql, seconds in request_metrics.queries)
+        slow_logger.warning(
+            'Slow request %s %s (%s) -> %s in %.1f ms, %d queries in %.1f ms\n%s',
+            request.method, request.get_full_path(), view, response.status_code, elapsed_ms,
+            request_metrics.db_queries, request_metrics.db_time * 1000, queries,
+        )
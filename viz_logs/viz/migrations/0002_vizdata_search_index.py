@@ -0,0 +1,36 @@
+from django.db import migrations
+
+from viz.search import FULLTEXT_INDEX_NAME
+
+
+def create_fulltext_index(apps, schema_editor):
+    # viz_data is owned by the tracker (managed = False), so the index is
+    # added with raw SQL. Only MySQL has FULLTEXT/ngram; other databases
+    # fall back to icontains in viz.search.
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        f'CREATE FULLTEXT INDEX {FULLTEXT_INDEX_NAME} '
+        'ON viz_data (display_name, group_id, sponsor_logo_name) WITH PARSER ngram'
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(f'DROP INDEX {FULLTEXT_INDEX_NAME} ON viz_data')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viz', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='vizdata',
+            options={'managed': False, 'ordering': ['-created_at']},
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def add_histogram_column(apps, schema_editor):
+    # viz_data is managed = False, so AddField only updates the migration
+    # state and the column has to be added explicitly.
+    VizData = apps.get_model('viz', 'VizData')
+    schema_editor.add_field(VizData, VizData._meta.get_field('histogram'))
+
+
+def remove_histogram_column(apps, schema_editor):
+    VizData = apps.get_model('viz', 'VizData')
+    schema_editor.remove_field(VizData, VizData._meta.get_field('histogram'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viz', '0002_vizdata_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vizdata',
+            name='histogram',
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(add_histogram_column, remove_histogram_column),
+    ]
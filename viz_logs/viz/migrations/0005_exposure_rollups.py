@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viz', '0004_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_row_id', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'viz_rollup_watermark',
+            },
+        ),
+        migrations.CreateModel(
+            name='ExposureRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('hour', 'Hour')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('sponsor_logo_name', models.CharField(blank=True, max_length=255)),
+                ('group_id', models.CharField(max_length=50)),
+                ('time_on_air', models.FloatField(default=0)),
+                ('time_on_camera', models.FloatField(default=0)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('weighted_bins', models.BinaryField(default=b'')),
+                ('unweighted_bins', models.BinaryField(default=b'')),
+                ('histogram_weight', models.FloatField(default=0)),
+                ('histogram_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'viz_exposure_rollup',
+                'ordering': ['granularity', 'bucket'],
+                'indexes': [models.Index(fields=['granularity', 'sponsor_logo_name', 'bucket'], name='viz_rollup_logo_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='exposurerollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'bucket', 'sponsor_logo_name', 'group_id'), name='viz_rollup_unique_bucket'),
+        ),
+    ]
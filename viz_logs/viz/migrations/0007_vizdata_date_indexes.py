@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+INDEXES = [
+    models.Index(fields=['created_at', 'group_id'], name='viz_data_created_group_idx'),
+    models.Index(fields=['sponsor_logo_name', 'created_at'], name='viz_data_logo_created_idx'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    # viz_data is managed = False, so AddIndex only updates the migration
+    # state and the indexes have to be created explicitly.
+    VizData = apps.get_model('viz', 'VizData')
+    for index in INDEXES:
+        schema_editor.add_index(VizData, index)
+
+
+def drop_indexes(apps, schema_editor):
+    VizData = apps.get_model('viz', 'VizData')
+    for index in INDEXES:
+        schema_editor.remove_index(VizData, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viz', '0005_exposure_rollups'),
+    ]
+
+    operations = [
+        # 0001 recorded the column under its old name; the tracker's table has
+        # sponsor_logo_name, and renaming an unmanaged model's field touches no table
+        migrations.RenameField(model_name='vizdata', old_name='viz_name', new_name='sponsor_logo_name'),
+        *[migrations.AddIndex(model_name='vizdata', index=index) for index in INDEXES],
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
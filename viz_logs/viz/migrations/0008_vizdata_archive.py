@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:26
+
+from django.db import migrations, models
+
+from viz.retention import FUTURE_PARTITION
+
+
+def partition_archive_table(apps, schema_editor):
+    # MySQL only: compress the table and partition it by month of created_at.
+    # Every unique key has to contain the partitioning column, so the primary
+    # key becomes (id, created_at). viz.retention splits a partition off
+    # p_future for each month it archives. Other databases keep a plain table.
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('ALTER TABLE viz_data_archive DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)')
+    schema_editor.execute('ALTER TABLE viz_data_archive ROW_FORMAT=COMPRESSED')
+    schema_editor.execute(
+        'ALTER TABLE viz_data_archive PARTITION BY RANGE COLUMNS (created_at) '
+        f'(PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE))'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viz', '0007_vizdata_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VizDataArchive',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('group_id', models.CharField(max_length=50)),
+                ('display_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('time_on_air', models.FloatField(blank=True, null=True)),
+                ('time_on_camera', models.FloatField(blank=True, null=True)),
+                ('sponsor_logo_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('visibility_map', models.TextField(max_length=16383)),
+                ('histogram', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'viz_data_archive',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at', 'group_id'], name='viz_archive_created_group_idx')],
+            },
+        ),
+        # Dropping the table on the way back undoes the partitioning too
+        migrations.RunPython(partition_archive_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viz', '0008_vizdata_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sponsor_logo_name', models.CharField(blank=True, max_length=255)),
+                ('file_path', models.CharField(max_length=500)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('last_row_id', models.BigIntegerField(default=0)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('generated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'viz_archived_report',
+                'ordering': ['-day', 'sponsor_logo_name'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='archivedreport',
+            constraint=models.UniqueConstraint(fields=('day', 'sponsor_logo_name'), name='viz_report_unique_day_logo'),
+        ),
+    ]
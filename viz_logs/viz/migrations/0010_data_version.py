@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-17 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('viz', '0009_archived_report'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('changed_at', models.DateTimeField(null=True)),
+            ],
+            options={
+                'db_table': 'viz_data_version',
+            },
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
-import json
+from django.utils.text import slugify
+import uuid
+from .encoding import (parse_visibility_map, load_visibility_map, normalise_visibility, encode_histogram,
+                       decode_histogram, histogram_label)
 
 class VizData(models.Model):
     id = models.AutoField(primary_key=True)
@@ -9,37 +12,209 @@ class VizData(models.Model):
     time_on_camera = models.FloatField(null=True, blank=True)
     sponsor_logo_name = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     visibility_map = models.TextField(max_length=16383)
+    # Normalised, bin-sorted visibility_map (see viz.encoding), filled on write or by backfill_histograms
+    histogram = models.BinaryField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'viz_data'
         ordering = ['-created_at']
         managed = False  # Add this line
+        # Created by migration 0007; date ranges on their own and per sponsor logo
+        indexes = [
+            models.Index(fields=['created_at', 'group_id'], name='viz_data_created_group_idx'),
+            models.Index(fields=['sponsor_logo_name', 'created_at'], name='viz_data_logo_created_idx'),
+        ]
 
-    def get_visibility_data(self):
-        """Parse the JSON visibility map and return as dict"""
+    def save(self, *args, **kwargs):
+        if self.histogram is None:
+            self.refresh_histogram()
+        super().save(*args, **kwargs)
+
+    def refresh_histogram(self):
+        """Compute the normalised, bin-sorted histogram from visibility_map and store it"""
         try:
-            j = json.loads(self.visibility_map)
-            total = 0
-            for key in j:
-                total += j[key]
-            if total > 0:
-                for key in j:
-                    j[key] = round((j[key] / total) * 100, 2)
-
-            return j
-        except json.JSONDecodeError:
-            return {}
+            self.histogram = encode_histogram(normalise_visibility(load_visibility_map(self.visibility_map)))
+        except (TypeError, ValueError):
+            self.histogram = encode_histogram([])
+
+    def get_histogram_bins(self):
+        """Return the normalised histogram as bin-sorted (bin, percent) pairs"""
+        if self.histogram is not None:
+            return decode_histogram(self.histogram)
+        # Legacy row written before the histogram column was backfilled
+        return parse_visibility_map(self.visibility_map)
+
+    def get_visibility_data(self):
+        """Return the visibility map normalised to percentages, keyed by bin"""
+        return {str(bin_num): value for bin_num, value in self.get_histogram_bins()}
 
     def get_histogram_data(self):
         """Convert visibility map to histogram format for Chart.js"""
-        visibility_data = self.get_visibility_data()
-        # Sort by bin number
-        sorted_bins = sorted(visibility_data.items(), key=lambda x: int(x[0]))
+        bins = self.get_histogram_bins()
         return {
-            'labels': [f"{int(bin_num) - 10} - {int(bin_num)-1 if int(bin_num) < 100 else 100} %" for bin_num, _ in sorted_bins],
-            'values': [value for _, value in sorted_bins]
+            'labels': [histogram_label(bin_num) for bin_num, _ in bins],
+            'values': [value for _, value in bins]
         }
 
     def __str__(self):
-        return f"{self.display_name or self.group_id} - {self.sponsor_logo_name}"
\ No newline at end of file
+        return f"{self.display_name or self.group_id} - {self.sponsor_logo_name}"
+
+def load_legacy_visibility_maps(items):
+    """Fill in visibility_map with one query for rows fetched with it deferred and no histogram yet"""
+    legacy = {item.id: item for item in items if item.histogram is None}
+    if legacy:
+        for pk, visibility_map in VizData.objects.filter(id__in=legacy).values_list('id', 'visibility_map'):
+            legacy[pk].visibility_map = visibility_map
+    return items
+
+
+class VizDataArchive(models.Model):
+    """viz_data rows older than the retention window, moved here by viz.retention
+
+    Same columns as viz_data. On MySQL the table is compressed and
+    partitioned by month of created_at, so its primary key is really
+    (id, created_at); ids stay unique because they come from viz_data.
+    """
+    id = models.IntegerField(primary_key=True)
+    group_id = models.CharField(max_length=50)
+    display_name = models.CharField(max_length=255, null=True, blank=True)
+    time_on_air = models.FloatField(null=True, blank=True)
+    time_on_camera = models.FloatField(null=True, blank=True)
+    sponsor_logo_name = models.CharField(max_length=255, null=True, blank=True)
+    visibility_map = models.TextField(max_length=16383)
+    histogram = models.BinaryField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'viz_data_archive'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'group_id'], name='viz_archive_created_group_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.display_name or self.group_id} - {self.sponsor_logo_name} (archived)"
+
+
+class ExportJob(models.Model):
+    """A PDF export rendered in the background by viz.jobs"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    selected_ids = models.JSONField(default=list)
+    progress = models.PositiveSmallIntegerField(default=0)
+    file_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'viz_export_job'
+        ordering = ['-created_at']
+
+    @property
+    def filename(self):
+        return f"viz_data_report_{self.created_at.strftime('%Y%m%d_%H%M%S')}.pdf"
+
+    def __str__(self):
+        return f"Export {self.id} ({self.status})"
+
+
+class ArchivedReport(models.Model):
+    """A PDF report of one day's rows, for every logo or one sponsor logo, pre-rendered by viz.report_archive"""
+    day = models.DateField()
+    # '' for the report covering every sponsor logo
+    sponsor_logo_name = models.CharField(max_length=255, blank=True)
+    file_path = models.CharField(max_length=500)
+    row_count = models.PositiveIntegerField(default=0)
+    # Newest viz_data id in the report; with row_count, tells whether the day changed since
+    last_row_id = models.BigIntegerField(default=0)
+    size = models.PositiveBigIntegerField(default=0)
+    generated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'viz_archived_report'
+        ordering = ['-day', 'sponsor_logo_name']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'sponsor_logo_name'], name='viz_report_unique_day_logo'),
+        ]
+
+    @property
+    def filename(self):
+        logo = slugify(self.sponsor_logo_name) or 'all_logos'
+        return f"viz_data_report_{self.day:%Y%m%d}_{logo}.pdf"
+
+    def __str__(self):
+        return f"Report {self.day} {self.sponsor_logo_name or 'all logos'}"
+
+
+class ExposureRollup(models.Model):
+    """Per day or per hour totals of one sponsor logo on one camera, maintained by viz.rollups"""
+    DAY = 'day'
+    HOUR = 'hour'
+    GRANULARITY_CHOICES = [
+        (DAY, 'Day'),
+        (HOUR, 'Hour'),
+    ]
+
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+    # Rows without a logo name are rolled up under ''
+    sponsor_logo_name = models.CharField(max_length=255, blank=True)
+    group_id = models.CharField(max_length=50)
+    time_on_air = models.FloatField(default=0)
+    time_on_camera = models.FloatField(default=0)
+    row_count = models.PositiveIntegerField(default=0)
+    # Per-bin sums of the rows' percentages, weighted by time on air and unweighted (see HistogramMerge)
+    weighted_bins = models.BinaryField(default=b'')
+    unweighted_bins = models.BinaryField(default=b'')
+    histogram_weight = models.FloatField(default=0)
+    histogram_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'viz_exposure_rollup'
+        ordering = ['granularity', 'bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'bucket', 'sponsor_logo_name', 'group_id'],
+                                    name='viz_rollup_unique_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'sponsor_logo_name', 'bucket'], name='viz_rollup_logo_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M} {self.sponsor_logo_name} / {self.group_id}"
+
+
+class RollupWatermark(models.Model):
+    """Highest viz_data id already folded into the rollups"""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_row_id = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'viz_rollup_watermark'
+
+
+class DataVersion(models.Model):
+    """Counter bumped whenever existing viz_data rows move, see caching.bump_data_version
+
+    The newest row id only notices new rows; archiving or restoring a month
+    changes listings without touching it.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = 'viz_data_version'
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db.models import Q
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_page_size(value=None):
+    """Clamp a requested page size to the configured bounds"""
+    default = getattr(settings, 'VIZ_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, 'VIZ_MAX_PAGE_SIZE', MAX_PAGE_SIZE)
+    try:
+        size = int(value) if value else default
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def encode_cursor(item):
+    """Encode the (group_id, id) position of a row as an opaque cursor"""
+    raw = json.dumps([item.group_id, item.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor back to (group_id, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        group_id, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(group_id), int(pk)
+    except (ValueError, TypeError):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+
+def _page_queryset(queryset, cursor, page_size):
+    queryset = queryset.order_by('group_id', 'id')
+    if cursor:
+        group_id, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(group_id__gt=group_id) | Q(group_id=group_id, id__gt=pk))
+    # Fetch one extra row to find out whether another page exists
+    return queryset[:page_size + 1]
+
+
+def _split_page(rows, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
+
+
+def paginate(queryset, cursor=None, page_size=None):
+    """Return one keyset page of rows ordered by (group_id, id) and the cursor of the next page
+
+    The page is located with a range predicate on the sort key instead of an
+    OFFSET, so the cost of fetching page N does not grow with N.
+    """
+    page_size = get_page_size(page_size)
+    return _split_page(list(_page_queryset(queryset, cursor, page_size)), page_size)
+
+
+async def apaginate(queryset, cursor=None, page_size=None):
+    """Async version of paginate, using the async ORM"""
+    page_size = get_page_size(page_size)
+    return _split_page([row async for row in _page_queryset(queryset, cursor, page_size)], page_size)
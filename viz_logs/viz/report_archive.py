@@ -0,0 +1,82 @@
+"""Daily PDF reports rendered ahead of time by manage.py generate_reports
+
+For each day there is one report covering every sponsor logo and one per
+logo, holding the same pages export_pdf would build for that day's rows.
+They are rendered off-peak and served from the report archive, so the
+common "yesterday" requests are a file download and export_pdf only runs
+for custom selections. A report is only rendered again when the day's row
+count or newest row id changed since.
+"""
+from django.conf import settings
+from django.db.models import Count, Max
+from .aggregation import combined_logo_time
+from .filters import filter_queryset
+from .models import ArchivedReport, VizData
+import hashlib
+import os
+
+
+def get_report_dir():
+    path = getattr(settings, 'VIZ_REPORT_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'reports'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def day_rows(day, viz_name=''):
+    """The VizData rows of ``day`` (in the current time zone), optionally of one sponsor logo"""
+    return filter_queryset(VizData.objects.all(), {'created_at': day.isoformat(), 'viz_name': viz_name})
+
+
+def generate_report(day, viz_name='', force=False):
+    """Render the report of one day and logo ('' for all) unless it is up to date
+
+    Returns (report, rendered); report is None when the day has no rows.
+    """
+    # ReportLab is only needed here, see views.export_pdf
+    from .reports import build_report
+
+    selected = day_rows(day, viz_name)
+    stats = selected.aggregate(row_count=Count('id'), last_row_id=Max('id'))
+    if not stats['row_count']:
+        return None, False
+
+    report = ArchivedReport.objects.filter(day=day, sponsor_logo_name=viz_name).first()
+    if (report is not None and not force and os.path.exists(report.file_path)
+            and (report.row_count, report.last_row_id) == (stats['row_count'], stats['last_row_id'])):
+        return report, False
+
+    logo = hashlib.sha1(viz_name.encode()).hexdigest()[:12] if viz_name else 'all'
+    file_path = os.path.join(get_report_dir(), f"{day:%Y-%m-%d}_{logo}.pdf")
+    # Render next to the old file and swap it in, so downloads never see a half-written report
+    partial = f"{file_path}.partial"
+    try:
+        build_report(list(selected.order_by('-created_at')), combined_logo_time(selected), partial)
+        os.replace(partial, file_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    report, _ = ArchivedReport.objects.update_or_create(
+        day=day, sponsor_logo_name=viz_name,
+        defaults={'file_path': file_path, 'size': os.path.getsize(file_path), **stats},
+    )
+    return report, True
+
+
+def generate_day_reports(day, per_logo=True, force=False, progress=None):
+    """Render the all-logos report of ``day`` and, with ``per_logo``, one per sponsor logo seen that day
+
+    ``progress`` is called with each (report, rendered) pair. Returns the
+    number of reports rendered.
+    """
+    logos = ['']
+    if per_logo:
+        logos += sorted(day_rows(day).exclude(sponsor_logo_name=None).exclude(sponsor_logo_name='')
+                        .order_by().values_list('sponsor_logo_name', flat=True).distinct())
+    rendered = 0
+    for viz_name in logos:
+        report, was_rendered = generate_report(day, viz_name, force)
+        rendered += was_rendered
+        if progress and report is not None:
+            progress(report, was_rendered)
+    return rendered
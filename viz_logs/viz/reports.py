@@ -0,0 +1,243 @@
+from django.conf import settings
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib import colors
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from .charts import render_histogram_charts
+from .chart_cache import get_chart_cache, chart_key, load_chart
+import logging
+import multiprocessing
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+_render_pool = None
+_render_pool_workers = 0
+_render_pool_lock = threading.Lock()
+
+def format_time_duration(seconds):
+    if seconds is None:
+        return "N/A"
+    try:
+        seconds = float(seconds)
+        hours = int(seconds // 3600)
+        minutes = int((seconds % 3600) // 60)
+        secs = int(seconds % 60)
+        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+    except (ValueError, TypeError):
+        return "00:00:00"
+
+
+def get_report_styles():
+    """Paragraph styles used by the PDF report"""
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            textColor=colors.HexColor('#2c3e50'),
+            spaceAfter=10,
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#34495e'),
+            spaceAfter=10,
+        ),
+        'bar_title': ParagraphStyle(
+            'CustomHeading',
+            parent=styles['Heading3'],
+            fontSize=14,
+            textColor=colors.HexColor('#34495e'),
+            spaceAfter=10,
+            alignment=1,  # Center alignment
+        ),
+    }
+
+
+def header(canvas, doc):
+    """Draw the letterhead image on the first page"""
+    canvas.saveState()
+    img_path = os.path.join(settings.BASE_DIR, 'static', 'image.png')
+    canvas.drawImage(img_path, doc.leftMargin-inch, doc.height - 0.5*inch,
+                    width=doc.width+2*inch, height=(1.8*inch), preserveAspectRatio=False)
+    canvas.restoreState()
+
+
+def get_render_workers():
+    return getattr(settings, 'VIZ_REPORT_RENDER_WORKERS', os.cpu_count() or 1)
+
+
+def get_render_pool():
+    """Return the process pool used to build report charts, or None when rendering serially"""
+    global _render_pool, _render_pool_workers
+    workers = get_render_workers()
+    if workers <= 1:
+        return None
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _render_pool_workers = workers
+        return _render_pool
+
+
+def discard_render_pool(pool):
+    """Shut down a broken render pool so the next report starts a fresh one"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_in_pool(pool, pending):
+    """Build charts across ``pool``, or serially if one of its processes died"""
+    # A few chunks per worker keeps the pool busy without paying per-item IPC
+    workers = _render_pool_workers if pool is _render_pool else get_render_workers()
+    chunk_size = max(1, len(pending) // (max(workers, 1) * 4))
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    try:
+        return [chart for chunk in pool.map(render_histogram_charts, chunks) for chart in chunk]
+    except BrokenProcessPool:
+        logger.warning('Chart render pool broke, rendering this report serially', exc_info=True)
+        discard_render_pool(pool)
+        return render_histogram_charts(pending)
+
+
+def render_charts(histograms, pool=None):
+    """Build the histogram chart of every report section
+
+    Charts already in the chart cache are reused. The rest are built once
+    per distinct histogram, split into chunks that the render pool builds
+    in parallel for large reports; ``pool=False`` forces serial rendering.
+    """
+    cache = get_chart_cache()
+    keys = [chart_key(data) if data['values'] else None for data in histograms]
+    rendered = {}
+    missing = {}
+    for key, data in zip(keys, histograms):
+        if key is None or key in rendered or key in missing:
+            continue
+        cached = cache.get(key) if cache is not None else None
+        if cached is None:
+            missing[key] = data
+        else:
+            rendered[key] = cached
+
+    if missing:
+        min_items = getattr(settings, 'VIZ_REPORT_PARALLEL_MIN_ITEMS', 20)
+        if pool is None and len(missing) >= min_items:
+            pool = get_render_pool()
+
+        pending = list(missing.values())
+        if pool:
+            charts = render_in_pool(pool, pending)
+        else:
+            charts = render_histogram_charts(pending)
+
+        for key, chart in zip(missing, charts):
+            rendered[key] = chart
+            if cache is not None:
+                cache.set(key, chart)
+
+    return [load_chart(rendered[key]) if key else None for key in keys]
+
+
+def item_section(item, styles, chart):
+    """Flowables for one report entry: heading, details table and histogram chart"""
+    elements = []
+
+    # Add item heading
+    item_title = f"{item.display_name or item.group_id} - {item.sponsor_logo_name or 'N/A'}"
+    elements.append(Paragraph(item_title, styles['heading']))
+    elements.append(Spacer(1, 0.1*inch))
+
+    # Add details table
+    details_data = [
+        ['Camera ID:', item.group_id],
+        ['Display Name:', item.display_name or 'N/A'],
+        ['Sponsor Logo Name:', item.sponsor_logo_name or 'N/A'],
+        ['Time on Air:', f"{format_time_duration(item.time_on_air)}"],
+        ['Time on Camera:', f"{format_time_duration(item.time_on_camera)}"],
+        ['Date Time:', item.created_at.strftime('%Y-%m-%d %H:%M:%S')],
+    ]
+
+    details_table = Table(details_data, colWidths=[2*inch, 4*inch])
+    details_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2c3e50')),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+    elements.append(details_table)
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Add histogram
+    if chart is not None:
+        elements.append(Paragraph("Percentage Visibility v. Time on Screen (%)", styles['bar_title']))
+        elements.append(chart)
+
+    return elements
+
+
+def build_report(viz_data_items, combined_items, output, progress=None, pool=None):
+    """Render the PDF report for the given VizData rows
+
+    ``combined_items`` are the per-logo totals for the "Combined Logo Time"
+    pages, as returned by viz.aggregation.combined_logo_time. ``output``
+    is a filename or a writable binary file object. ``progress``,
+    if given, is called with the fraction of the report completed so far.
+    ``pool`` overrides the chart render pool (see render_charts).
+    """
+    doc = SimpleDocTemplate(output, pagesize=letter,
+                  topMargin=0.5*inch, bottomMargin=0.5*inch)
+    elements = []
+    styles = get_report_styles()
+
+    total_sections = len(viz_data_items) + len(combined_items)
+    charts = render_charts([item.get_histogram_data() for item in viz_data_items + combined_items], pool)
+
+    # Add title
+    title = Paragraph(f"Virtual Logos Data Report - {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles['title'])
+    elements.append(Spacer(1, inch))
+    elements.append(title)
+
+    for idx, item in enumerate(viz_data_items):
+        if idx > 0:
+            elements.append(PageBreak())
+        elements.extend(item_section(item, styles, charts[idx]))
+        if progress:
+            progress(0.5 * (idx + 1) / total_sections)
+
+    elements.append(Spacer(1, 0.5*inch))
+    elements.append(Paragraph(f"Combined Logo Time", styles['title']))
+    elements.append(PageBreak())
+
+    for idx, item in enumerate(combined_items):
+        if idx % 3 == 0 and idx > 0:
+            elements.append(PageBreak())
+        elements.extend(item_section(item, styles, charts[len(viz_data_items) + idx]))
+        if progress:
+            progress(0.5 * (len(viz_data_items) + idx + 1) / total_sections)
+
+    if progress:
+        # Layout is the second half of the work, reported per flowable
+        flowable_count = len(elements)
+        def on_layout(kind, value):
+            if kind == 'PROGRESS' and flowable_count:
+                progress(0.5 + 0.5 * min(value, flowable_count) / flowable_count)
+        doc.setProgressCallBack(on_layout)
+
+    # Build PDF
+    doc.build(elements, onFirstPage=header)
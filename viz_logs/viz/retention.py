@@ -0,0 +1,161 @@
+"""Moving viz_data rows older than the retention window to viz_data_archive and back
+
+viz_data only keeps the last VIZ_ARCHIVE_KEEP_MONTHS whole months plus the
+current one, so the index, facets and exports work on a table that stops
+growing. Older months are moved in id-ordered batches, each one an
+INSERT ... SELECT plus DELETE in its own transaction, so an interrupted run
+leaves every row in exactly one of the two tables.
+
+viz_data itself can't be partitioned on MySQL: its FULLTEXT index (see
+migration 0002) isn't allowed on partitioned tables. The archive is
+partitioned instead, one partition per archived month (bounds in UTC, as
+created_at is stored), so date-limited queries on it touch only those
+months and a month can be dropped or exported on its own.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from datetime import date
+from .caching import bump_data_version
+from .facets import facet_cache
+from .filters import day_start
+from .models import VizData, VizDataArchive
+
+DEFAULT_KEEP_MONTHS = 6
+DEFAULT_BATCH_SIZE = 5000
+# Open-ended partition above the newest archived month
+FUTURE_PARTITION = 'p_future'
+
+
+def add_months(month, count):
+    """The first day of the month ``count`` months after ``month``"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def archive_cutoff(keep_months=None, today=None):
+    """First day of the oldest month kept in viz_data; older rows get archived"""
+    if keep_months is None:
+        keep_months = getattr(settings, 'VIZ_ARCHIVE_KEEP_MONTHS', DEFAULT_KEEP_MONTHS)
+    today = today or timezone.localdate()
+    return add_months(today.replace(day=1), -keep_months)
+
+
+def parse_month(value):
+    """The first day of a "YYYY-MM" month; raises ValueError otherwise"""
+    year, month = value.split('-')
+    return date(int(year), int(month), 1)
+
+
+def partition_name(month):
+    return f'p{month:%Y%m}'
+
+
+def archive_partitions():
+    """Names of the archive table's partitions, oldest first (MySQL only)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT PARTITION_NAME FROM information_schema.PARTITIONS '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL '
+            'ORDER BY PARTITION_ORDINAL_POSITION',
+            [VizDataArchive._meta.db_table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_partition(month):
+    """Split a partition for ``month`` off the open-ended one, on MySQL
+
+    Partitions have to stay in order, so a month older than the newest
+    partition is left in whichever partition already covers it.
+    """
+    if connection.vendor != 'mysql':
+        return
+    name = partition_name(month)
+    partitions = [partition for partition in archive_partitions() if partition != FUTURE_PARTITION]
+    if name in partitions or (partitions and name < partitions[-1]):
+        return
+    with connection.cursor() as cursor:
+        # DDL, so this commits on its own
+        cursor.execute(
+            f'ALTER TABLE {VizDataArchive._meta.db_table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ('
+            f"PARTITION {name} VALUES LESS THAN ('{add_months(month, 1):%Y-%m-%d}'), "
+            f'PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE))'
+        )
+
+
+def _move_batch(source, target, start, end, batch_size):
+    in_month = source.objects.filter(created_at__gte=start, created_at__lt=end).order_by()
+    with transaction.atomic():
+        ids = list(in_month.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0
+        batch = in_month.filter(id__gte=ids[0], id__lte=ids[-1])
+        columns = [field.column for field in VizData._meta.concrete_fields]
+        select, params = batch.values_list(*columns).query.sql_with_params()
+        with connection.cursor() as cursor:
+            quoted = ', '.join(connection.ops.quote_name(column) for column in columns)
+            cursor.execute(f'INSERT INTO {connection.ops.quote_name(target._meta.db_table)} ({quoted}) {select}',
+                           params)
+        batch.delete()
+    return len(ids)
+
+
+def move_month(month, restore=False, batch_size=None):
+    """Move one month's rows to the archive (or back with ``restore``); returns the number moved"""
+    batch_size = batch_size or getattr(settings, 'VIZ_ARCHIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    source, target = (VizDataArchive, VizData) if restore else (VizData, VizDataArchive)
+    if not restore:
+        ensure_partition(month)
+    start, end = day_start(month), day_start(add_months(month, 1))
+    moved = 0
+    while count := _move_batch(source, target, start, end, batch_size):
+        moved += count
+    return moved
+
+
+def months_to_archive(cutoff):
+    """{month: row count} of viz_data rows created before ``cutoff``, oldest first"""
+    queryset = (VizData.objects.filter(created_at__lt=day_start(cutoff))
+                .annotate(month=TruncMonth('created_at')).values('month').annotate(rows=Count('id'))
+                .order_by('month'))
+    # TruncMonth gives midnight on the 1st in the current time zone
+    return {entry['month'].date(): entry['rows'] for entry in queryset}
+
+
+def archive_old_rows(keep_months=None, batch_size=None, progress=None):
+    """Move every month before the retention window to the archive, oldest first
+
+    Returns {month: rows moved}. ``progress`` is called with each month and
+    its count as it finishes.
+    """
+    moved = {}
+    for month in months_to_archive(archive_cutoff(keep_months)):
+        moved[month] = move_month(month, batch_size=batch_size)
+        if progress:
+            progress(month, moved[month])
+    if moved:
+        forget_listings()
+    return moved
+
+
+def restore_month(month, batch_size=None):
+    """Move an archived month back into viz_data; returns the number of rows"""
+    moved = move_month(month, restore=True, batch_size=batch_size)
+    if moved:
+        forget_listings()
+    return moved
+
+
+def forget_listings():
+    """Move cached facets and table pages on, as they only notice new rows, not moved old ones
+
+    Bumping the data version changes every listing ETag and fragment cache
+    key, so other worker processes and shared caches follow at once and the
+    old pages age out; facets cached inside other processes follow within
+    VIZ_FACET_TTL.
+    """
+    bump_data_version()
+    facet_cache.invalidate()
@@ -0,0 +1,197 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from .aggregation import HistogramMerge
+from .encoding import decode_histogram, encode_histogram, histogram_label, parse_visibility_map
+from .models import VizData, VizDataArchive, ExposureRollup, RollupWatermark
+from datetime import datetime, time, timedelta
+
+WATERMARK_NAME = 'exposure'
+CHUNK_SIZE = 5000
+DEFAULT_SETTLE_SECONDS = 60
+
+
+def bucket_start(created_at, granularity):
+    """Start of the day or hour containing created_at, in the current time zone"""
+    local = timezone.localtime(created_at) if timezone.is_aware(created_at) else created_at
+    if granularity == ExposureRollup.DAY:
+        return local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+class RollupDelta:
+    """Partial sums for one rollup row, accumulated in memory before being written"""
+
+    def __init__(self):
+        self.time_on_air = 0
+        self.time_on_camera = 0
+        self.row_count = 0
+        self.histogram = HistogramMerge()
+
+    def add(self, time_on_air, time_on_camera, bins):
+        self.time_on_air += time_on_air or 0
+        self.time_on_camera += time_on_camera or 0
+        self.row_count += 1
+        self.histogram.add(bins, time_on_air)
+
+    def apply(self, rollup):
+        merge = HistogramMerge()
+        merge.add_sums(decode_histogram(rollup.weighted_bins), decode_histogram(rollup.unweighted_bins),
+                       rollup.histogram_weight, rollup.histogram_count)
+        merge.add_sums(self.histogram.weighted.items(), self.histogram.unweighted.items(),
+                       self.histogram.total_weight, self.histogram.count)
+        rollup.time_on_air += self.time_on_air
+        rollup.time_on_camera += self.time_on_camera
+        rollup.row_count += self.row_count
+        rollup.weighted_bins = encode_histogram(sorted(merge.weighted.items()))
+        rollup.unweighted_bins = encode_histogram(sorted(merge.unweighted.items()))
+        rollup.histogram_weight = merge.total_weight
+        rollup.histogram_count = merge.count
+
+
+def _rows_after(last_id, max_id):
+    # Archived rows still count, so a rebuild after archiving loses no buckets
+    for model in (VizData, VizDataArchive):
+        # Rows with a precomputed histogram skip the JSON blob
+        queryset = model.objects.filter(id__gt=last_id, id__lte=max_id).order_by('id')
+        fields = ('id', 'sponsor_logo_name', 'group_id', 'created_at', 'time_on_air', 'time_on_camera')
+        for row in queryset.filter(histogram__isnull=False).values_list(*fields, 'histogram').iterator(chunk_size=CHUNK_SIZE):
+            yield row[:-1] + (decode_histogram(row[-1]),)
+        for row in queryset.filter(histogram__isnull=True).values_list(*fields, 'visibility_map').iterator(chunk_size=CHUNK_SIZE):
+            yield row[:-1] + (parse_visibility_map(row[-1]),)
+
+
+def _write_deltas(deltas):
+    keys = list(deltas)
+    existing = {}
+    for granularity in {key[0] for key in keys}:
+        buckets = {key[1] for key in keys if key[0] == granularity}
+        for rollup in ExposureRollup.objects.filter(granularity=granularity, bucket__in=buckets):
+            existing[(rollup.granularity, rollup.bucket, rollup.sponsor_logo_name, rollup.group_id)] = rollup
+
+    created = []
+    updated = []
+    for key, delta in deltas.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            granularity, bucket, logo, group_id = key
+            rollup = ExposureRollup(granularity=granularity, bucket=bucket, sponsor_logo_name=logo, group_id=group_id)
+            created.append(rollup)
+        else:
+            updated.append(rollup)
+        delta.apply(rollup)
+
+    ExposureRollup.objects.bulk_create(created, batch_size=500)
+    ExposureRollup.objects.bulk_update(updated, ['time_on_air', 'time_on_camera', 'row_count', 'weighted_bins',
+                                                 'unweighted_bins', 'histogram_weight', 'histogram_count'],
+                                       batch_size=500)
+
+
+def settled_max_id(after_id):
+    """Highest viz_data id above ``after_id`` that is safe to fold in, or ``after_id``
+
+    Concurrent inserts (the tracker's, or ingest's chunk transactions) can
+    commit out of id order, so a row below MAX(id) may still become
+    visible later. Rows only count once they are VIZ_ROLLUP_SETTLE_SECONDS
+    old, and the watermark stops at the newest settled row below the first
+    unsettled one: any id under that was handed out earlier, so its row has
+    committed too. This assumes no insert transaction stays open longer
+    than the settle time.
+    """
+    settle = getattr(settings, 'VIZ_ROLLUP_SETTLE_SECONDS', DEFAULT_SETTLE_SECONDS)
+    new_rows = VizData.objects.filter(id__gt=after_id).order_by()
+    first_unsettled = new_rows.filter(created_at__gte=timezone.now() - timedelta(seconds=settle)).aggregate(
+        first=Min('id'))['first']
+    if first_unsettled is not None:
+        new_rows = new_rows.filter(id__lt=first_unsettled)
+    return new_rows.aggregate(max_id=Max('id'))['max_id'] or after_id
+
+
+def update_rollups():
+    """Fold settled viz_data rows newer than the watermark into the daily and hourly rollups
+
+    Returns the number of rows processed. Run from cron with
+    ``manage.py rebuild_rollups --incremental``; when nothing is new it
+    costs two lookups on the rows above the watermark.
+    """
+    processed = 0
+    with transaction.atomic():
+        state, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+        max_id = settled_max_id(state.last_row_id)
+        if max_id <= state.last_row_id:
+            return 0
+
+        deltas = {}
+        for pk, logo, group_id, created_at, time_on_air, time_on_camera, bins in _rows_after(state.last_row_id, max_id):
+            for granularity in (ExposureRollup.DAY, ExposureRollup.HOUR):
+                key = (granularity, bucket_start(created_at, granularity), logo or '', group_id)
+                deltas.setdefault(key, RollupDelta()).add(time_on_air, time_on_camera, bins)
+            processed += 1
+            if len(deltas) >= CHUNK_SIZE:
+                _write_deltas(deltas)
+                deltas = {}
+        _write_deltas(deltas)
+
+        state.last_row_id = max_id
+        state.save(update_fields=['last_row_id'])
+    return processed
+
+
+def rebuild_rollups():
+    """Drop every rollup and recompute them from all of viz_data"""
+    with transaction.atomic():
+        ExposureRollup.objects.all().delete()
+        RollupWatermark.objects.filter(name=WATERMARK_NAME).delete()
+        return update_rollups()
+
+
+def exposure_summary(granularity, date_from=None, date_to=None, viz_name=None, group_id=None, by_camera=False):
+    """Totals per bucket and logo (and camera with by_camera) read from the rollups
+
+    ``date_from``/``date_to`` are inclusive dates. The cost depends on the
+    number of buckets in the range, not on the number of raw rows.
+    """
+    queryset = ExposureRollup.objects.filter(granularity=granularity)
+    if date_from:
+        queryset = queryset.filter(bucket__gte=_start_of(date_from))
+    if date_to:
+        queryset = queryset.filter(bucket__lt=_start_of(date_to + timedelta(days=1)))
+    if viz_name:
+        queryset = queryset.filter(sponsor_logo_name=viz_name)
+    if group_id:
+        queryset = queryset.filter(group_id=group_id)
+
+    summary = {}
+    for rollup in queryset.order_by('bucket', 'sponsor_logo_name', 'group_id'):
+        key = (rollup.bucket, rollup.sponsor_logo_name, rollup.group_id if by_camera else None)
+        entry = summary.get(key)
+        if entry is None:
+            entry = summary[key] = {
+                'bucket': rollup.bucket,
+                'sponsor_logo_name': rollup.sponsor_logo_name,
+                'cameras': [],
+                'time_on_air': 0,
+                'time_on_camera': 0,
+                'row_count': 0,
+                'histogram': HistogramMerge(),
+            }
+        entry['cameras'].append(rollup.group_id)
+        entry['time_on_air'] += rollup.time_on_air
+        entry['time_on_camera'] += rollup.time_on_camera
+        entry['row_count'] += rollup.row_count
+        entry['histogram'].add_sums(decode_histogram(rollup.weighted_bins), decode_histogram(rollup.unweighted_bins),
+                                    rollup.histogram_weight, rollup.histogram_count)
+
+    for entry in summary.values():
+        bins = entry['histogram'].bins()
+        entry['histogram'] = {
+            'labels': [histogram_label(bin_num) for bin_num, _ in bins],
+            'values': [value for _, value in bins]
+        }
+    return list(summary.values())
+
+
+def _start_of(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q, Func, FloatField
+from django.utils import timezone
+from datetime import datetime, timedelta
+import re
+
+SEARCH_FIELDS = ('display_name', 'group_id', 'sponsor_logo_name')
+FULLTEXT_INDEX_NAME = 'viz_data_search_ft'
+
+# Smallest token the MySQL ngram parser indexes (ngram_token_size)
+MIN_FULLTEXT_TOKEN = 2
+
+DATE_PATTERN = re.compile(
+    r'\b(\d{4})-(\d{2})(?:-(\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2}))?)?)?\b'
+)
+
+
+class MatchAgainst(Func):
+    """MATCH (...) AGAINST (... IN BOOLEAN MODE) relevance over a FULLTEXT index"""
+    template = 'MATCH (%(expressions)s) AGAINST (%%s IN BOOLEAN MODE)'
+    output_field = FloatField()
+
+    def __init__(self, *expressions, query):
+        super().__init__(*expressions)
+        self.query = query
+
+    def as_sql(self, compiler, connection, **extra_context):
+        sql, params = super().as_sql(compiler, connection, **extra_context)
+        return sql, (*params, self.query)
+
+
+def _next_month(value):
+    return value.replace(year=value.year + value.month // 12, month=value.month % 12 + 1)
+
+
+def parse_date_terms(search):
+    """Split date-like terms out of a search string
+
+    Returns the remaining text and a list of half-open (start, end)
+    datetime ranges, one per recognised YYYY-MM, YYYY-MM-DD or
+    YYYY-MM-DD HH:MM[:SS] term.
+    """
+    ranges = []
+
+    def replace(match):
+        year, month, day, hour, minute, second = match.groups()
+        try:
+            if day is None:
+                start = datetime(int(year), int(month), 1)
+                end = _next_month(start)
+            elif hour is None:
+                start = datetime(int(year), int(month), int(day))
+                end = start + timedelta(days=1)
+            elif second is None:
+                start = datetime(int(year), int(month), int(day), int(hour), int(minute))
+                end = start + timedelta(minutes=1)
+            else:
+                start = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+                end = start + timedelta(seconds=1)
+        except ValueError:
+            # Not a real date, keep it as text
+            return match.group(0)
+
+        if settings.USE_TZ:
+            start = timezone.make_aware(start)
+            end = timezone.make_aware(end)
+        ranges.append((start, end))
+        return ' '
+
+    text = ' '.join(DATE_PATTERN.sub(replace, search).split())
+    return text, ranges
+
+
+def use_fulltext(using='default'):
+    """Whether the FULLTEXT index can serve searches on this database"""
+    backend = getattr(settings, 'VIZ_SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        return connections[using].vendor == 'mysql'
+    return backend == 'fulltext'
+
+
+def fulltext_query(text):
+    """Build a boolean-mode query requiring every word of the search text"""
+    words = re.sub(r'[+\-<>()~*"@]', ' ', text).split()
+    if not words or any(len(word) < MIN_FULLTEXT_TOKEN for word in words):
+        return None
+    return ' '.join(f'+"{word}"' for word in words)
+
+
+def apply_search(queryset, search):
+    """Filter a VizData queryset by the index search box value
+
+    Date-like terms become created_at range predicates, the rest of the
+    text is matched against the FULLTEXT index on MySQL, or with
+    icontains on the text columns elsewhere (SQLite in tests).
+    """
+    text, ranges = parse_date_terms(search)
+
+    for start, end in ranges:
+        queryset = queryset.filter(created_at__gte=start, created_at__lt=end)
+
+    if text:
+        query = fulltext_query(text) if use_fulltext(queryset.db) else None
+        if query:
+            queryset = queryset.alias(
+                search_rank=MatchAgainst(*SEARCH_FIELDS, query=query)
+            ).filter(search_rank__gt=0)
+        else:
+            condition = Q()
+            for field in SEARCH_FIELDS:
+                condition |= Q(**{f'{field}__icontains': text})
+            queryset = queryset.filter(condition)
+
+    return queryset
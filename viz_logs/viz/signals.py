@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent after new viz_data rows have been written by this app.
+# Receivers get ``rows``, the list of VizData instances that were saved.
+rows_ingested = Signal()
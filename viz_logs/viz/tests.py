@@ -1,3 +1,585 @@
-from django.test import TestCase
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .benchmarks import STARTUP_TARGETS, build_dataset, create_table, scenarios, measure, measure_startup
+from .caching import RESPONSE_VERSION, fragment_cache
+from .chart_cache import MemoryChartCache, chart_key, get_chart_cache
+from .db.pool import ConnectionPool, PoolTimeout
+from .encoding import decode_histogram, encode_histogram, parse_visibility_map
+from .facets import FacetCache, facet_cache
+from .filters import filter_queryset
+from .jobs import get_export_dir, run_export_job
+from .metrics import registry
+from .models import ArchivedReport, ExportJob, VizData, VizDataArchive
+from .report_archive import generate_day_reports
+from .retention import archive_old_rows, restore_month
+from .rollups import rebuild_rollups, update_rollups
+from .search import apply_search, parse_date_terms
+from datetime import date, datetime, timedelta
+from unittest import mock
+import json
+import os
+import tempfile
 
-# Create your tests here.
+
+class QueryBudgetTests(TransactionTestCase):
+    """Every benchmark scenario stays within its query budget on a small synthetic table
+
+    TransactionTestCase because viz_data is rebuilt with DDL, which SQLite
+    refuses inside the transaction TestCase wraps each test in.
+    """
+
+    def setUp(self):
+        self.values = build_dataset(300)
+        facet_cache.invalidate()
+
+    def test_scenarios_within_query_budget(self):
+        for scenario in scenarios(self.values):
+            with self.subTest(scenario.name):
+                result = measure(scenario, repeat=1)
+                self.assertLessEqual(result['queries'], scenario.max_queries)
+
+
+class DateFilterTests(TransactionTestCase):
+    """Date filters select whole days through index range scans"""
+
+    def setUp(self):
+        self.values = build_dataset(300)
+
+    def listing(self, **filters):
+        # Ordered like the index table
+        return filter_queryset(VizData.objects.all(), filters).order_by('group_id', 'id')
+
+    def test_day_and_range_match_calendar_dates(self):
+        day = self.values['created_at']
+        self.assertEqual(self.listing(created_at=day).count(), VizData.objects.filter(created_at__date=day).count())
+        self.assertEqual(self.listing(date_from=self.values['date_from'], date_to=day).count(),
+                         VizData.objects.filter(created_at__date__range=(self.values['date_from'], day)).count())
+        self.assertEqual(self.listing(created_at='not a date').count(), VizData.objects.count())
+
+    def test_date_range_uses_created_at_index(self):
+        plan = self.listing(date_from=self.values['date_from'], date_to=self.values['created_at']).explain()
+        self.assertIn('viz_data_created_group_idx', plan)
+
+    def test_logo_and_day_use_logo_index(self):
+        plan = self.listing(viz_name=self.values['viz_name'], created_at=self.values['created_at']).explain()
+        self.assertIn('viz_data_logo_created_idx', plan)
+
+
+class IngestTests(TransactionTestCase):
+    """/api/ingest/ validates JSON lines and writes them in chunks with their derived columns"""
+
+    def setUp(self):
+        create_table()
+        settings = override_settings(VIZ_INGEST_TOKENS=['secret'], VIZ_INGEST_CHUNK_SIZE=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def post(self, lines, token='secret'):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        return self.client.post('/api/ingest/', '\n'.join(lines), content_type='application/x-ndjson',
+                                headers=headers)
+
+    def test_requires_token(self):
+        record = json.dumps({'group_id': 'CAM'})
+        self.assertEqual(self.post([record], token=None).status_code, 401)
+        self.assertEqual(self.post([record], token='wrong').status_code, 401)
+        self.assertFalse(VizData.objects.exists())
+
+    def test_inserts_valid_lines_in_chunks(self):
+        lines = [json.dumps({'group_id': f'CAM{n}', 'time_on_air': 10, 'visibility_map': {'10': 3, '20': 1}})
+                 for n in range(5)]
+        lines[1:1] = ['not json', json.dumps({'group_id': 'CAM', 'visibility_map': {'200': 1}}), '']
+        stats = self.post(lines).json()
+
+        self.assertEqual({name: stats[name] for name in ('success', 'received', 'inserted', 'rejected', 'chunks')},
+                         {'success': False, 'received': 7, 'inserted': 5, 'rejected': 2, 'chunks': 3})
+        self.assertEqual([error['line'] for error in stats['errors']], [2, 3])
+        row = VizData.objects.get(group_id='CAM0')
+        self.assertEqual(row.visibility_map, '{"10":3,"20":1}')
+        self.assertEqual([bin_num for bin_num, _ in row.get_histogram_bins()], [10, 20])
+
+    def test_huge_numbers_are_rejected(self):
+        lines = ['{"group_id": "CAM", "time_on_air": 1%s}' % ('0' * 400),
+                 '{"group_id": "CAM", "visibility_map": {"10": 1%s}}' % ('0' * 400),
+                 '{"group_id": "CAM", "time_on_air": 1%s}' % ('0' * 5000),
+                 json.dumps({'group_id': 'CAM'})]
+        stats = self.post(lines).json()
+        self.assertEqual((stats['inserted'], stats['rejected']), (1, 3))
+
+    def test_all_rejected_is_bad_request(self):
+        self.assertEqual(self.post([json.dumps({'time_on_air': 1})]).status_code, 400)
+
+
+class CursorTests(TransactionTestCase):
+    """Keyset cursors walk every row exactly once, even across equal timestamps"""
+
+    def setUp(self):
+        build_dataset(300)
+
+    def test_pages_cover_every_row_once(self):
+        seen = []
+        cursor = ''
+        while True:
+            page = self.client.get('/api/histograms/', {'page_size': 7, 'cursor': cursor}).json()
+            seen += [item['id'] for item in page['data']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(sorted(seen), sorted(VizData.objects.values_list('id', flat=True)))
+
+    def test_bad_cursor(self):
+        self.assertEqual(self.client.get('/api/rows/', {'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/histograms/', {'cursor': 'garbage'}).status_code, 400)
+
+
+class SearchTests(TransactionTestCase):
+    """Date-like search terms become created_at ranges, the rest is matched as text"""
+
+    def setUp(self):
+        create_table()
+        for group_id, created_at in (('CAM-A', datetime(2024, 3, 5, 10, 15)), ('CAM-B', datetime(2024, 3, 6))):
+            row = VizData.objects.create(group_id=group_id, sponsor_logo_name='Logo')
+            VizData.objects.filter(pk=row.pk).update(created_at=timezone.make_aware(created_at))
+
+    def test_parse_date_terms(self):
+        text, ranges = parse_date_terms('logo 2024-02-30 2024-03 2024-03-05 10:15')
+        self.assertEqual(text, 'logo 2024-02-30')
+        start = timezone.make_aware(datetime(2024, 3, 5, 10, 15))
+        self.assertEqual(ranges, [
+            (timezone.make_aware(datetime(2024, 3, 1)), timezone.make_aware(datetime(2024, 4, 1))),
+            (start, start + timedelta(minutes=1)),
+        ])
+
+    def search(self, value):
+        return sorted(apply_search(VizData.objects.all(), value).values_list('group_id', flat=True))
+
+    def test_text_and_dates(self):
+        self.assertEqual(self.search('logo 2024-03'), ['CAM-A', 'CAM-B'])
+        self.assertEqual(self.search('2024-03-06'), ['CAM-B'])
+        self.assertEqual(self.search('cam-a 2024-03-05'), ['CAM-A'])
+        self.assertEqual(self.search('cam-a 2024-03-06'), [])
+
+    def test_fulltext_falls_back_to_icontains(self):
+        # Words shorter than the FULLTEXT token size can't use the index
+        with override_settings(VIZ_SEARCH_BACKEND='fulltext'):
+            self.assertEqual(self.search('-b'), ['CAM-B'])
+
+
+class PoolTests(SimpleTestCase):
+
+    class Connection:
+        def __init__(self, fail_rollback=False):
+            self.fail_rollback = fail_rollback
+            self.closed = False
+
+        def rollback(self):
+            if self.fail_rollback:
+                raise RuntimeError('connection lost')
+
+        def ping(self):
+            if self.closed:
+                raise RuntimeError('closed')
+
+        def close(self):
+            self.closed = True
+
+    def test_checkout_checkin_and_timeout(self):
+        pool = ConnectionPool(self.Connection, max_size=1, timeout=0.05)
+        first = pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        pool.checkin(first)
+        self.assertIs(pool.checkout(), first)
+
+        pool.checkin(first, discard=True)
+        self.assertTrue(first.closed)
+        second = pool.checkout()
+        self.assertIsNot(second, first)
+        second.fail_rollback = True
+        pool.checkin(second)
+        self.assertTrue(second.closed)
+
+    def test_expired_connections_are_replaced(self):
+        pool = ConnectionPool(self.Connection, max_size=2, max_idle=-1)
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertIsNot(pool.checkout(), first)
+        self.assertTrue(first.closed)
+
+
+class FacetTests(TransactionTestCase):
+    """Facets are built once, then follow new rows incrementally until invalidated"""
+
+    def setUp(self):
+        create_table()
+        VizData.objects.create(group_id='CAM1', sponsor_logo_name='Logo')
+        VizData.objects.create(group_id='CAM2', sponsor_logo_name=None)
+
+    def test_values_and_incremental_updates(self):
+        facets = FacetCache(ttl=300, check_interval=300, cache_alias='')
+        self.assertEqual(facets.get()['group_ids'], ['CAM1', 'CAM2'])
+        self.assertEqual(facets.get()['viz_names'], ['Logo'])
+        self.assertEqual(facets.get()['dates'], [timezone.localdate()])
+
+        # Ingested rows are folded in without a query
+        row = VizData.objects.create(group_id='CAM3', sponsor_logo_name='Other')
+        with self.assertNumQueries(0):
+            facets.record_rows([row])
+            self.assertEqual(facets.get()['viz_names'], ['Logo', 'Other'])
+
+        # Rows written elsewhere are picked up by the next check
+        VizData.objects.create(group_id='CAM4', sponsor_logo_name='Logo')
+        facets.check_interval = 0
+        self.assertEqual(facets.get()['group_ids'], ['CAM1', 'CAM2', 'CAM3', 'CAM4'])
+
+    def test_invalidate(self):
+        facets = FacetCache(ttl=300, check_interval=300, cache_alias='')
+        self.assertEqual(facets.get()['viz_names'], ['Logo'])
+        VizData.objects.filter(sponsor_logo_name='Logo').delete()
+        self.assertEqual(facets.get()['viz_names'], ['Logo'])
+        facets.invalidate()
+        self.assertEqual(facets.get()['viz_names'], [])
+
+
+class ChartCacheTests(SimpleTestCase):
+
+    def test_memory_cache_evicts_least_recently_used(self):
+        cache = MemoryChartCache(max_bytes=10)
+        cache.set('a', b'aaaa')
+        cache.set('b', b'bbbb')
+        self.assertEqual(cache.get('a'), b'aaaa')
+        cache.set('c', b'cccc')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), (b'aaaa', b'cccc'))
+
+    @override_settings(VIZ_CHART_CACHE_BACKEND='memory')
+    def test_reports_reuse_cached_charts(self):
+        from .reports import render_charts
+        get_chart_cache().clear()
+        histograms = [{'labels': ['0 - 9 %'], 'values': [100.0]}, {'labels': [], 'values': []}]
+
+        first = render_charts(histograms, pool=False)
+        self.assertIsNone(first[1])
+        self.assertIsNotNone(get_chart_cache().get(chart_key(histograms[0])))
+        with mock.patch('viz.reports.render_histogram_charts') as render:
+            second = render_charts(histograms, pool=False)
+        render.assert_not_called()
+        # Every use gets its own drawing
+        self.assertIsNot(second[0], first[0])
+
+
+class ExportStreamTests(TransactionTestCase):
+    """CSV and NDJSON exports stream every matching row in id order, across chunks"""
+
+    def setUp(self):
+        create_table()
+        for n in range(5):
+            VizData.objects.create(group_id=f'CAM{n}', sponsor_logo_name='Logo' if n % 2 else 'Other',
+                                   time_on_air=n, visibility_map='{"10": 1}')
+        settings = override_settings(VIZ_EXPORT_CHUNK_SIZE=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response = self.client.get('/export/csv/', {'viz_name': 'Logo'})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertRegex(response['Content-Disposition'], r'^attachment; filename="viz_data_\d{8}_\d{6}\.csv"$')
+        lines = self.body(response).splitlines()
+        self.assertEqual(lines[0], 'id,group_id,display_name,sponsor_logo_name,time_on_air,time_on_camera,'
+                                   'created_at,visibility_map')
+        self.assertEqual([line.split(',')[1] for line in lines[1:]], ['CAM1', 'CAM3'])
+        self.assertTrue(lines[1].endswith('"{""10"": 1}"'))
+
+    def test_ndjson(self):
+        response = self.client.get('/export/ndjson/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('.ndjson"', response['Content-Disposition'])
+        rows = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual([row['group_id'] for row in rows], [f'CAM{n}' for n in range(5)])
+        self.assertEqual((rows[2]['time_on_air'], rows[2]['visibility_map']), (2.0, '{"10": 1}'))
+
+
+class MetricsTests(TransactionTestCase):
+    """Every response carries Server-Timing, and /metrics exports the per-view counters"""
+
+    def setUp(self):
+        create_table()
+        self.row = VizData.objects.create(group_id='CAM', visibility_map='{"10": 1}')
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get(f'/api/histogram/{self.row.pk}/')
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="[1-9]\d* queries"$')
+
+        response = self.client.get('/metrics')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('viz_requests_total{view="viz:histogram_data",method="GET",status="200"} 1\n', text)
+        self.assertIn('viz_request_duration_seconds_count{view="viz:histogram_data"} 1\n', text)
+        self.assertRegex(text, r'viz_db_queries_total\{view="viz:histogram_data"\} [1-9]')
+
+
+@override_settings(VIZ_FRAGMENT_CACHE_ALIAS='fragments', VIZ_INGEST_TOKENS=['secret'])
+class FragmentCacheTests(TransactionTestCase):
+    """Rendered table pages are served from the fragment cache until a new row arrives"""
+
+    def setUp(self):
+        create_table()
+        fragment_cache().clear()
+        VizData.objects.create(group_id='CAM1', visibility_map='{"10": 1}')
+
+    def test_hit_then_new_row(self):
+        first = self.client.get('/api/rows/').json()
+        # Only the newest row lookup; no page query, no rendering
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/rows/').json(), first)
+
+        self.client.post('/api/ingest/', json.dumps({'group_id': 'CAM2'}), content_type='application/x-ndjson',
+                         headers={'Authorization': 'Bearer secret'})
+        page = self.client.get('/api/rows/').json()
+        self.assertEqual((first['count'], page['count']), (1, 2))
+        self.assertIn('CAM2', page['html'])
+
+
+class RenderPoolTests(SimpleTestCase):
+
+    @override_settings(VIZ_CHART_CACHE_BACKEND=None, VIZ_REPORT_RENDER_WORKERS=2, VIZ_REPORT_PARALLEL_MIN_ITEMS=1)
+    def test_broken_pool_is_replaced(self):
+        from concurrent.futures.process import BrokenProcessPool
+        from . import reports
+        broken = mock.Mock()
+        broken.map.side_effect = BrokenProcessPool('worker died')
+        with mock.patch.object(reports, '_render_pool', broken), self.assertLogs('viz.reports', 'WARNING'):
+            charts = reports.render_charts([{'labels': ['0 - 9 %'], 'values': [100.0]}])
+            self.assertIsNone(reports._render_pool)
+        self.assertIsNotNone(charts[0])
+        broken.shutdown.assert_called_once()
+
+
+def etag_for(pk):
+    return f'"v{RESPONSE_VERSION}-row-{pk}"'
+
+
+class RowValidatorTests(TransactionTestCase):
+
+    def setUp(self):
+        create_table()
+        self.row = VizData.objects.create(group_id='CAM', visibility_map='{"10": 1}')
+
+    def test_existing_row_revalidates(self):
+        etag = self.client.get(f'/api/histogram/{self.row.pk}/').headers['ETag']
+        self.assertEqual(etag, etag_for(self.row.pk))
+        response = self.client.get(f'/api/histogram/{self.row.pk}/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_row_has_no_validator(self):
+        missing = self.row.pk + 1
+        response = self.client.get(f'/api/histogram/{missing}/')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('ETag', response.headers)
+        for etag in ('*', etag_for(missing)):
+            response = self.client.get(f'/api/histogram/{missing}/', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 404)
+
+
+class StartupTests(SimpleTestCase):
+
+    def test_worker_boot_does_not_import_reportlab(self):
+        self.assertFalse(measure_startup(STARTUP_TARGETS['wsgi'], repeat=1)['reportlab'])
+
+
+class ArchiveTests(TransactionTestCase):
+    """Months before the retention window move to viz_data_archive and can be moved back"""
+
+    def setUp(self):
+        build_dataset(300)
+        self.old_ids = list(VizData.objects.order_by('id').values_list('id', flat=True)[:120])
+        VizData.objects.filter(id__in=self.old_ids).update(created_at=timezone.now() - timedelta(days=400))
+
+    def test_archive_and_restore(self):
+        etag = self.client.get('/api/rows/').headers['ETag']
+        moved = archive_old_rows(keep_months=6, batch_size=50)
+        # Validators move on even though the newest row didn't change
+        response = self.client.get('/api/rows/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertEqual(sum(moved.values()), 120)
+        self.assertFalse(VizData.objects.filter(id__in=self.old_ids).exists())
+        self.assertEqual(sorted(VizDataArchive.objects.values_list('id', flat=True)), self.old_ids)
+        # Rollups are rebuilt from both tables
+        self.assertEqual(rebuild_rollups(), 300)
+
+        self.assertEqual(restore_month(next(iter(moved))), 120)
+        self.assertEqual(VizData.objects.count(), 300)
+        self.assertFalse(VizDataArchive.objects.exists())
+
+
+class RollupTests(TransactionTestCase):
+    """The rollup watermark never passes rows that may still commit with a lower id"""
+
+    def setUp(self):
+        create_table()
+
+    def add_row(self, pk, age):
+        VizData.objects.create(id=pk, group_id='CAM', sponsor_logo_name='Logo', time_on_air=10)
+        VizData.objects.filter(id=pk).update(created_at=timezone.now() - age)
+
+    def test_rows_committed_out_of_order_are_counted(self):
+        self.add_row(1, timedelta(hours=1))
+        self.add_row(5, timedelta(0))
+        with override_settings(VIZ_ROLLUP_SETTLE_SECONDS=60):
+            self.assertEqual(update_rollups(), 1)
+            # Commits after id 5 but is older than the settle window's rows
+            self.add_row(3, timedelta(hours=1))
+            self.assertEqual(update_rollups(), 1)
+            VizData.objects.filter(id=5).update(created_at=timezone.now() - timedelta(hours=1))
+            self.assertEqual(update_rollups(), 1)
+        summary = self.client.get('/api/summary/day/').json()['data']
+        self.assertEqual(sum(entry['row_count'] for entry in summary), 3)
+
+
+class LiveRowsTests(TransactionTestCase):
+    """New rows reach open index pages, including ones that were empty when loaded"""
+
+    def setUp(self):
+        create_table()
+
+    def test_empty_listing_goes_live(self):
+        self.assertContains(self.client.get('/', {'viz_name': 'Logo'}), 'id="rowsBody" data-live-after="0"')
+        row = VizData.objects.create(group_id='CAM', sponsor_logo_name='Logo')
+        VizData.objects.create(group_id='CAM', sponsor_logo_name='Other')
+
+        response = self.client.get('/api/live/', {'viz_name': 'Logo', 'after': 0})
+        self.assertIn(f'id: {row.pk}\nevent: rows\n', response.content.decode())
+        self.assertIn('"count": 1', response.content.decode())
+
+
+class ReportArchiveTests(TransactionTestCase):
+    """Daily reports are rendered once per change of the day's rows and served from the archive"""
+
+    def setUp(self):
+        self.day = build_dataset(300)['created_at']
+        report_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(report_dir.cleanup)
+        settings = override_settings(VIZ_REPORT_ARCHIVE_DIR=report_dir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_render_once_and_serve(self):
+        day = date.fromisoformat(self.day)
+        self.assertEqual(generate_day_reports(day, per_logo=False), 1)
+        self.assertEqual(generate_day_reports(day, per_logo=False), 0)
+
+        listing = self.client.get('/reports/', {'date': self.day}).json()['data']
+        self.assertEqual([report['row_count'] for report in listing], [300])
+        response = self.client.get(listing[0]['download_url'])
+        self.assertEqual(b''.join(response.streaming_content)[:4], b'%PDF')
+        self.assertContains(self.client.get('/', {'created_at': self.day}), listing[0]['download_url'])
+
+    def test_rendering_changes_listing_etag(self):
+        etag = self.client.get('/', {'created_at': self.day}).headers['ETag']
+        generate_day_reports(date.fromisoformat(self.day), per_logo=False)
+        response = self.client.get('/', {'created_at': self.day}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/download/')
+
+    def test_rows_page_skips_report_lookup(self):
+        generate_day_reports(date.fromisoformat(self.day), per_logo=False)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/rows/', {'created_at': self.day})
+        self.assertFalse([query for query in queries if 'viz_archived_report' in query['sql']])
+
+    async def test_streamed_download_length_matches_file(self):
+        await sync_to_async(generate_day_reports)(date.fromisoformat(self.day), per_logo=False)
+        report = await ArchivedReport.objects.aget()
+        # As if the report was regenerated after this row was read
+        await ArchivedReport.objects.filter(pk=report.pk).aupdate(size=1)
+        response = await self.async_client.get(f'/reports/{report.pk}/download/')
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(int(response['Content-Length']), len(body))
+
+
+class EncodingTests(SimpleTestCase):
+
+    def test_out_of_range_bins_are_dropped(self):
+        item = VizData(visibility_map='{"10": 30, "70000": 10, "-10": 5}')
+        item.refresh_histogram()
+        self.assertEqual([bin_num for bin_num, _ in item.get_histogram_bins()], [10])
+
+    def test_histogram_round_trip(self):
+        visibility_map = '{"20": 1, "10": 3, "100": 0.5}'
+        bins = parse_visibility_map(visibility_map)
+        self.assertEqual(decode_histogram(encode_histogram(bins)), bins)
+        self.assertEqual([bin_num for bin_num, _ in bins], [10, 20, 100])
+
+        item = VizData(visibility_map=visibility_map)
+        item.refresh_histogram()
+        self.assertEqual(item.get_histogram_bins(), bins)
+        self.assertEqual(decode_histogram(encode_histogram([])), [])
+
+
+class ExportJobTests(TransactionTestCase):
+
+    def setUp(self):
+        create_table()
+        export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_dir.cleanup)
+        settings = override_settings(VIZ_EXPORT_DIR=export_dir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_stale_job_reported_failed(self):
+        job = ExportJob.objects.create(selected_ids=[1], status=ExportJob.RUNNING)
+        ExportJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        with override_settings(VIZ_EXPORT_TIMEOUT_SECONDS=600):
+            payload = self.client.get(f'/export/pdf/jobs/{job.pk}/').json()
+        self.assertEqual((payload['success'], payload['status']), (False, ExportJob.FAILED))
+
+    def test_timed_out_job_stays_failed(self):
+        job = ExportJob.objects.create(selected_ids=[1], status=ExportJob.RUNNING)
+
+        def build_report(items, combined, file_path, progress=None):
+            # The status poll gives up on the job while it is still rendering
+            ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.FAILED, error='Export timed out')
+            open(file_path, 'wb').close()
+
+        ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.PENDING)
+        with mock.patch('viz.reports.build_report', build_report):
+            run_export_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error, job.file_path), (ExportJob.FAILED, 'Export timed out', ''))
+        self.assertEqual(os.listdir(get_export_dir()), [])
+
+        # A worker picking up a job that already timed out leaves it alone
+        run_export_job(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.FAILED)
+
+
+class CombinedDataTests(TransactionTestCase):
+
+    def setUp(self):
+        create_table()
+        precomputed = VizData(group_id='CAM,1', sponsor_logo_name='Logo', time_on_air=100, visibility_map='{"10": 5}')
+        precomputed.refresh_histogram()
+        # Legacy row, merged from its visibility_map
+        legacy = VizData(group_id='CAM2', sponsor_logo_name='Logo', time_on_air=300, visibility_map='{"20": 7}')
+        VizData.objects.bulk_create([precomputed, legacy])
+
+    def test_histograms_weighted_by_time_on_air(self):
+        [logo] = self.client.get('/api/combined/', {'viz_name': 'Logo'}).json()['data']
+        self.assertEqual(logo['cameras'], ['CAM,1', 'CAM2'])
+        self.assertEqual(logo['histogram']['values'], [25.0, 75.0])
+
+    def test_requires_ids_or_filter(self):
+        self.assertEqual(self.client.get('/api/combined/').status_code, 400)
+        with override_settings(VIZ_HISTOGRAM_BATCH_LIMIT=2):
+            self.assertEqual(self.client.get('/api/combined/', {'ids': '1,2,3'}).status_code, 400)
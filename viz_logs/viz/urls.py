@@ -5,6 +5,20 @@ app_name = 'viz'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('api/rows/', views.rows_page, name='rows_page'),
+    path('api/live/', views.live_rows, name='live_rows'),
     path('api/histogram/<int:pk>/', views.get_histogram_data, name='histogram_data'),
+    path('api/histograms/', views.get_histograms_data, name='histograms_data'),
+    path('api/combined/', views.get_combined_data, name='combined_data'),
+    path('api/summary/<str:granularity>/', views.get_summary_data, name='summary_data'),
+    path('api/ingest/', views.ingest_data, name='ingest_data'),
     path('export/pdf/', views.export_pdf, name='export_pdf'),
+    path('export/csv/', views.export_csv, name='export_csv'),
+    path('export/ndjson/', views.export_ndjson, name='export_ndjson'),
+    path('export/pdf/jobs/', views.export_pdf_job, name='export_pdf_job'),
+    path('export/pdf/jobs/<uuid:job_id>/', views.export_job_status, name='export_job_status'),
+    path('export/pdf/jobs/<uuid:job_id>/download/', views.export_job_download, name='export_job_download'),
+    path('reports/', views.report_archive, name='report_archive'),
+    path('reports/<int:pk>/download/', views.archived_report_download, name='archived_report_download'),
+    path('metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,155 +1,274 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Q
-from .models import VizData
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
-from reportlab.lib import colors
-from reportlab.graphics.shapes import Drawing
-from reportlab.graphics.charts.barcharts import VerticalBarChart
-from io import BytesIO
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header
+from .models import VizData, ExportJob, ExposureRollup, ArchivedReport, load_legacy_visibility_maps
+from .filters import get_filter_params, filter_queryset, parse_day
+from .pagination import paginate, get_page_size, InvalidCursor
+from .facets import get_facets
+from .aggregation import combined_logo_time
+from .rollups import exposure_summary
+from .ingest import ingest_lines
+from .exports import csv_stream, ndjson_stream, acsv_stream, andjson_stream
+from .jobs import submit_export, fail_if_stale, get_export_timeout
+from .caching import (adaily_report, aindex_etag, alatest_row, alisting_etag, alisting_last_modified, async_condition,
+                      arow, arow_etag, arendered_rows)
+from .metrics import registry, timer
+from . import live
+from tempfile import SpooledTemporaryFile
 from datetime import datetime
+import hmac
+import os
 
-def format_time_duration(seconds):
-    if seconds is None:
-        return "N/A"
-    try:
-        seconds = float(seconds)
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        secs = int(seconds % 60)
-        return f"{hours:02d}:{minutes:02d}:{secs:02d}"
-    except (ValueError, TypeError):
-        return "00:00:00"
-    
-
-def combine_groups_on_viz_name(data:list[VizData])->list[VizData]:
-    """Combine VizData entries by viz_name, summing time_on_air and time_on_camera"""
-    result = {}
-    for item in data:
-        if item.sponsor_logo_name not in result:
-            result[item.sponsor_logo_name] = {
-                'group_id': item.group_id,
-                'display_name': item.display_name,
-                'sponsor_logo_name': item.sponsor_logo_name,
-                'time_on_air': item.time_on_air or 0,
-                'visiblity_map': item.visibility_map,
-                'time_on_camera': item.time_on_camera or 0,
-                'created_at': item.created_at
-            }
-        else:
-            result[item.sponsor_logo_name]['time_on_air'] += item.time_on_air or 0
-            result[item.sponsor_logo_name]['time_on_camera'] += item.time_on_camera or 0
-            result[item.sponsor_logo_name]['group_id'] += " + " + item.group_id
-            # Keep the latest created_at
-            if item.created_at > result[item.sponsor_logo_name]['created_at']:
-                result[item.sponsor_logo_name]['created_at'] = item.created_at
-                
-                result[item.sponsor_logo_name]['display_name'] = item.display_name
-    
-    combined_list = []
-    for key in result:
-        combined_item = VizData(
-            group_id=result[key]['group_id'],
-            display_name=result[key]['display_name'],
-            sponsor_logo_name=result[key]['sponsor_logo_name'],
-            time_on_air=result[key]['time_on_air'],
-            time_on_camera=result[key]['time_on_camera'],
-            created_at=result[key]['created_at']
-        )
-        combined_list.append(combined_item)
-
-    return combined_list
-    
+# Listings change whenever a row arrives, so browsers revalidate every time and get a 304 if nothing did
+LISTING_CACHE_CONTROL = {'private': True, 'no_cache': True}
 
-def index(request):
+@async_condition(etag_func=aindex_etag, last_modified_func=alisting_last_modified,
+                 cache_control=LISTING_CACHE_CONTROL)
+async def index(request):
     """Main view to display the data table"""
     # Get filter parameters
-    search = request.GET.get('search', '')
-    group_id_filter = request.GET.get('group_id', '')
-    viz_name_filter = request.GET.get('viz_name', '')
-    created_at_filter = request.GET.get('created_at', '')
-    
-    # Base query
-    queryset = VizData.objects.all()
-   
-    
-    # Apply filters
-    if search:
-        queryset = queryset.filter(
-            Q(display_name__icontains=search) |
-            Q(group_id__icontains=search) |
-            Q(sponsor_logo_name__icontains=search)|
-            Q(created_at__icontains=search),
-        )
-    
-    if group_id_filter:
-        queryset = queryset.filter(group_id=group_id_filter)
-    
-    if viz_name_filter:
-        queryset = queryset.filter(sponsor_logo_name=viz_name_filter)
-    
-    if created_at_filter:
-        # Accept either "YYYY-MM-DD HH:MM:SS" or "YYYY-MM-DD" from the template,
-        # parse the value and filter by the date portion only.
-        date_val = None
-        try:
-            date_val = datetime.strptime(created_at_filter, '%Y-%m-%d %H:%M:%S').date()
-        except ValueError:
-            try:
-                date_val = datetime.strptime(created_at_filter, '%Y-%m-%d').date()
-            except ValueError:
-                date_val = None
-
-        if date_val:
-            queryset = queryset.filter(created_at__date=date_val)
-        else:
-            # Fallback: try the original exact match if parsing failed
-            print("Falling Back to default")
-            queryset = queryset.filter(created_at=created_at_filter)
-    
-    # Get top 10 latest
-    viz_data = queryset.order_by('group_id')
+    filters = get_filter_params(request.GET)
+
+    # Only the first page is rendered here, the table loads the rest from rows_page
+    rows = await arendered_rows(request)
+    # Rows newer than this are pushed by live_rows
+    live_after, _, _ = await alatest_row(request)
     
     # Get unique values for filters
-    all_group_ids = VizData.objects.values_list('group_id', flat=True).distinct()
-    all_viz_names = VizData.objects.values_list('sponsor_logo_name', flat=True).distinct()
-    all_dates = [date["created_at"].date() for date in VizData.objects.values('created_at').distinct()]
-    all_dates = set(all_dates)
-    all_dates = list(all_dates)
-    all_dates.sort(key=lambda x: x.toordinal(), reverse=True)
-    
+    facets = await sync_to_async(get_facets)()
+
+    # A single day, for all logos or one, has a pre-rendered report in the archive
+    daily_report = await adaily_report(request)
     
     context = {
-        'viz_data': viz_data,
-        'search': search,
-        'group_id_filter': group_id_filter,
-        'viz_name_filter': viz_name_filter,
-        'created_at_filter': created_at_filter,
-        'all_group_ids': all_group_ids,
-        'all_viz_names': all_viz_names,
-        'all_dates': all_dates,
+        'rows_html': rows['html'],
+        'row_count': rows['count'],
+        'next_cursor': rows['next_cursor'],
+        'live_after': live_after,
+        'search': filters['search'],
+        'group_id_filter': filters['group_id'],
+        'viz_name_filter': filters['viz_name'],
+        'created_at_filter': filters['created_at'],
+        'date_from': filters['date_from'],
+        'date_to': filters['date_to'],
+        'all_group_ids': facets['group_ids'],
+        'all_viz_names': facets['viz_names'],
+        'all_dates': facets['dates'],
+        'daily_report': daily_report,
+        'export_timeout_seconds': get_export_timeout(),
     }
     
     return render(request, 'viz/index.html', context)
 
-def get_histogram_data(request, pk):
-    """API endpoint to get histogram data for a specific row"""
+@async_condition(etag_func=alisting_etag, last_modified_func=alisting_last_modified,
+                 cache_control=LISTING_CACHE_CONTROL)
+async def rows_page(request):
+    """API endpoint returning the next page of table rows for the index filters"""
+    try:
+        rows = await arendered_rows(request, request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'success': True,
+        'html': rows['html'],
+        'count': rows['count'],
+        'next_cursor': rows['next_cursor'],
+    })
+
+async def live_rows(request):
+    """Server-sent events with rows newer than the client's last seen id, for the index filters
+
+    Over ASGI the stream stays open and pushes rows as they arrive. Over WSGI a
+    held-open stream would tie up a worker, so the response carries whatever is
+    new right now and the browser's automatic reconnect turns it into polling.
+    """
     try:
-        viz_data = VizData.objects.get(pk=pk)
-        histogram_data = viz_data.get_histogram_data()
-        return JsonResponse({
-            'success': True,
-            'data': histogram_data,
-            'display_name': viz_data.display_name or viz_data.group_id,
-            'viz_name': viz_data.sponsor_logo_name
-        })
-    except VizData.DoesNotExist:
+        after_id = int(request.headers.get('Last-Event-ID') or request.GET.get('after') or 0)
+    except ValueError:
+        return HttpResponse('after must be an integer', status=400)
+    filters = get_filter_params(request.GET)
+
+    if serves_async(request):
+        response = StreamingHttpResponse(live.event_stream(filters, after_id), content_type='text/event-stream')
+    else:
+        rows = await live.arows_after(filters, after_id)
+        body = live.retry_field() + (live.rows_event(rows) if rows else '')
+        response = HttpResponse(body, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@async_condition(etag_func=arow_etag)
+async def get_histogram_data(request, pk):
+    """API endpoint to get histogram data for a specific row"""
+    # visibility_map is only loaded for rows whose histogram hasn't been backfilled
+    viz_data = await arow(request, pk)
+    if viz_data is None:
         return JsonResponse({'success': False, 'error': 'Data not found'}, status=404)
+    if viz_data.histogram is None:
+        # Deferred fields can't be loaded lazily from async code
+        viz_data.visibility_map = await (VizData.objects.filter(pk=pk)
+                                         .values_list('visibility_map', flat=True).afirst())
+    histogram_data = viz_data.get_histogram_data()
+    response = JsonResponse({
+        'success': True,
+        'data': histogram_data,
+        'display_name': viz_data.display_name or viz_data.group_id,
+        'viz_name': viz_data.sponsor_logo_name
+    })
+    # Rows never change once written
+    patch_cache_control(response, public=True, immutable=True,
+                        max_age=getattr(settings, 'VIZ_ROW_MAX_AGE', 365 * 24 * 3600))
+    return response
+
+def get_histograms_data(request):
+    """API endpoint to get histogram data for several rows in one request
+
+    Rows are selected either with ``ids`` (comma separated or repeated) or,
+    when no ids are given, with the index filter parameters, in which case
+    the response is paginated like rows_page.
+    """
+    limit = getattr(settings, 'VIZ_HISTOGRAM_BATCH_LIMIT', 100)
+    queryset = VizData.objects.defer('visibility_map')
+    raw_ids = [value for param in request.GET.getlist('ids') for value in param.split(',') if value.strip()]
+    next_cursor = None
+
+    if raw_ids:
+        try:
+            ids = list(dict.fromkeys(int(value) for value in raw_ids))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'ids must be integers'}, status=400)
+        if len(ids) > limit:
+            return JsonResponse({'success': False, 'error': f'At most {limit} ids can be requested at once'}, status=400)
+        items = list(queryset.filter(id__in=ids))
+    else:
+        filters = get_filter_params(request.GET)
+        try:
+            items, next_cursor = paginate(filter_queryset(queryset, filters), request.GET.get('cursor'),
+                                          min(get_page_size(request.GET.get('page_size')), limit))
+        except InvalidCursor as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
 
-def export_pdf(request):
+    load_legacy_visibility_maps(items)
+    found = {item.id for item in items}
+
+    return JsonResponse({
+        'success': True,
+        'data': [{
+            'id': item.id,
+            'data': item.get_histogram_data(),
+            'display_name': item.display_name or item.group_id,
+            'viz_name': item.sponsor_logo_name,
+        } for item in items],
+        'missing': [pk for pk in ids if pk not in found] if raw_ids else [],
+        'next_cursor': next_cursor,
+    })
+
+def get_combined_data(request):
+    """API endpoint combining rows per sponsor logo, selected by ids or the index filters
+
+    Like get_histograms_data, at most VIZ_HISTOGRAM_BATCH_LIMIT ids; without
+    ids at least one filter is required, so a bare request can't aggregate
+    the whole table.
+    """
+    limit = getattr(settings, 'VIZ_HISTOGRAM_BATCH_LIMIT', 100)
+    raw_ids = [value for param in request.GET.getlist('ids') for value in param.split(',') if value.strip()]
+    if raw_ids:
+        try:
+            ids = list(dict.fromkeys(int(value) for value in raw_ids))
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'ids must be integers'}, status=400)
+        if len(ids) > limit:
+            return JsonResponse({'success': False, 'error': f'At most {limit} ids can be requested at once'}, status=400)
+        queryset = VizData.objects.filter(id__in=ids)
+    else:
+        filters = get_filter_params(request.GET)
+        if not any(value.strip() for value in filters.values()):
+            return JsonResponse({'success': False, 'error': 'Select rows with ids or at least one filter'}, status=400)
+        queryset = filter_queryset(VizData.objects.all(), filters)
+
+    combined = combined_logo_time(queryset, histograms=request.GET.get('histograms', '1') != '0')
+    return JsonResponse({
+        'success': True,
+        'data': [item.as_dict() for item in combined],
+    })
+
+def get_summary_data(request, granularity):
+    """API endpoint with per-day or per-hour exposure totals per logo, served from the rollups
+
+    Read-only: rows count once cron's rebuild_rollups --incremental has folded them in.
+    """
+    if granularity not in (ExposureRollup.DAY, ExposureRollup.HOUR):
+        return JsonResponse({'success': False, 'error': 'Unknown granularity'}, status=404)
+
+    try:
+        date_from, date_to = (
+            datetime.strptime(request.GET[name], '%Y-%m-%d').date() if request.GET.get(name) else None
+            for name in ('date_from', 'date_to')
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Dates must be YYYY-MM-DD'}, status=400)
+
+    summary = exposure_summary(
+        granularity,
+        date_from=date_from,
+        date_to=date_to,
+        viz_name=request.GET.get('viz_name'),
+        group_id=request.GET.get('group_id'),
+        by_camera=request.GET.get('by') == 'camera',
+    )
+    return JsonResponse({'success': True, 'data': summary})
+
+def has_ingest_token(request):
+    """Check the request's bearer token against VIZ_INGEST_TOKENS"""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return False
+    return any(hmac.compare_digest(token.encode(), allowed.encode())
+               for allowed in getattr(settings, 'VIZ_INGEST_TOKENS', []))
+
+@csrf_exempt
+@require_POST
+def ingest_data(request):
+    """API endpoint for the tracker to bulk insert rows sent as JSON lines"""
+    if not has_ingest_token(request):
+        return JsonResponse({'success': False, 'error': 'Invalid or missing ingest token'}, status=401)
+
+    # Read the body line by line so large batches are never buffered whole
+    stats = ingest_lines(request)
+    return JsonResponse({'success': stats['rejected'] == 0, **stats},
+                        status=200 if stats['inserted'] or not stats['received'] else 400)
+
+def serves_async(request):
+    """Whether the request came in over ASGI, where only async iterators are streamed"""
+    return isinstance(request, ASGIRequest)
+
+def export_csv(request):
+    """Stream the rows matching the index filters as CSV"""
+    queryset = filter_queryset(VizData.objects.all(), get_filter_params(request.GET))
+    stream = acsv_stream if serves_async(request) else csv_stream
+    response = StreamingHttpResponse(stream(queryset), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="viz_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
+    return response
+
+def export_ndjson(request):
+    """Stream the rows matching the index filters as newline-delimited JSON"""
+    queryset = filter_queryset(VizData.objects.all(), get_filter_params(request.GET))
+    stream = andjson_stream if serves_async(request) else ndjson_stream
+    response = StreamingHttpResponse(stream(queryset), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="viz_data_{datetime.now().strftime("%Y%m%d_%H%M%S")}.ndjson"'
+    return response
+
+async def export_pdf(request):
     """Export selected rows with their histograms to PDF"""
     # Get selected IDs from POST
     selected_ids = request.POST.getlist('selected_ids[]')
@@ -157,204 +276,129 @@ def export_pdf(request):
     if not selected_ids:
         return HttpResponse('No items selected', status=400)
     
-    # Create PDF in memory
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter,
-                  topMargin=0.5*inch, bottomMargin=0.5*inch)
-    elements = []
-    styles = getSampleStyleSheet()
-
-     # Add letterhead to all pages
-    def header(canvas, doc):
-        # Draw the letterhead image
-        canvas.saveState()
-        img_path = 'static/image.png'  # Adjust path as needed
-        print(f"left margin: {doc.leftMargin}, top margin: {doc.topMargin}, width: {doc.width}, height: {inch}")
-        canvas.drawImage(img_path, doc.leftMargin-inch, doc.height - 0.5*inch, 
-                        width=doc.width+2*inch, height=(1.8*inch), preserveAspectRatio=False)
-        canvas.restoreState()
+    # ReportLab is imported on the first export rather than by every worker at start-up
+    from .reports import build_report
 
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#2c3e50'),
-        spaceAfter=10,
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#34495e'),
-        spaceAfter=10,
-    )
+    # Get selected data
+    selected = VizData.objects.filter(id__in=selected_ids)
+    viz_data_items = [item async for item in selected.order_by('-created_at')]
+    combined = await sync_to_async(combined_logo_time)(selected)
 
-    bar_title = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading3'],
-        fontSize=14,
-        textColor=colors.HexColor('#34495e'),
-        spaceAfter=10,
-        alignment=1,  # Center alignment
-    )
-    
-    
-    # Add title
-    title = Paragraph(f"Virtual Logos Data Report - {datetime.now().strftime('%Y-%m-%d %H:%M')}", title_style)
-    elements.append(Spacer(1, inch))
-    elements.append(title)
-    # elements.append(Spacer(1, 0.2*inch))
+    # Write the PDF to a spooled file that moves to disk once it grows past
+    # VIZ_PDF_SPOOL_MAX_BYTES, and stream it out from there
+    report = SpooledTemporaryFile(max_size=getattr(settings, 'VIZ_PDF_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+    try:
+        with timer('pdf'):
+            # Building the report is CPU-bound and needs no database, so it gets a thread of
+            # its own instead of blocking the event loop or the thread shared by sync views
+            await sync_to_async(build_report, thread_sensitive=False)(viz_data_items, combined, report)
+    except Exception:
+        report.close()
+        raise
+    report.seek(0)
     
-    # Get selected data
-    viz_data_items = VizData.objects.filter(id__in=selected_ids).order_by('-created_at')
+    filename = f'viz_data_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
+    if serves_async(request):
+        response = StreamingHttpResponse(stream_file(report), content_type='application/pdf')
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        return response
+    # FileResponse closes the file once the last chunk is sent
+    return FileResponse(report, as_attachment=True, content_type='application/pdf', filename=filename)
 
-    currentVizItems = [item for item in viz_data_items]
+async def stream_file(f, chunk_size=FileResponse.block_size):
+    """Async iterator over a local file's chunks, closing it at the end"""
+    try:
+        while chunk := f.read(chunk_size):
+            yield chunk
+    finally:
+        f.close()
 
-    combined_items = combine_groups_on_viz_name(currentVizItems)
-    
-    for idx, item in enumerate(viz_data_items):
-        if idx > 0:
-            elements.append(PageBreak())
-        
-        # Add item heading
-        item_title = f"{item.display_name or item.group_id} - {item.sponsor_logo_name or 'N/A'}"
-        elements.append(Paragraph(item_title, heading_style))
-        elements.append(Spacer(1, 0.1*inch))
-        
-        # Add details table
-        details_data = [
-            ['Camera ID:', item.group_id],
-            ['Display Name:', item.display_name or 'N/A'],
-            ['Sponsor Logo Name:', item.sponsor_logo_name or 'N/A'],
-            ['Time on Air:', f"{format_time_duration(item.time_on_air)}"],
-            ['Time on Camera:', f"{format_time_duration(item.time_on_camera)}"],
-            ['Date Time:', item.created_at.strftime('%Y-%m-%d %H:%M:%S')],
-        ]
-        
-        details_table = Table(details_data, colWidths=[2*inch, 4*inch])
-        details_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2c3e50')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        elements.append(details_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Add histogram
-        histogram_data = item.get_histogram_data()
-        if histogram_data['values']:
-            # Create chart
-            drawing = Drawing(400, 250)
-            chart = VerticalBarChart()
-            chart.x = 30
-            chart.y = 30
-            chart.height = 180
-            chart.width = 350
-            chart.data = [histogram_data['values']]
-            chart.categoryAxis.categoryNames = histogram_data['labels']
-            
-            chart.categoryAxis.labels.angle = 45
-            chart.categoryAxis.labels.fontSize = 8
-            chart.categoryAxis.labels.dy = -15
-            chart.categoryAxis.labels.fontName = 'Helvetica'
-            
-            chart.valueAxis.valueMin = 0
-            chart.valueAxis.labels.fontSize = 8
-            chart.valueAxis.labels.dx = -10
-            chart.valueAxis.labels.fontName = 'Helvetica'
-            chart.valueAxis.valueMax = max(histogram_data['values']) * 1.1 if histogram_data['values'] else 100
-            chart.bars[0].fillColor = colors.HexColor('#3498db')
-            chart.bars[0].strokeColor = colors.HexColor('#2980b9')
-            chart.bars[0].strokeWidth = 0.5
-
-            
-            drawing.add(chart)
-            elements.append(Paragraph("Percentage Visibility v. Time on Screen (%)", bar_title))
-            elements.append(drawing)
-
-    elements.append(Spacer(1, 0.5*inch))
-    elements.append(Paragraph(f"Combined Logo Time", title_style))
-    elements.append(PageBreak())
-
-    for idx, item in enumerate(combined_items):
-        if idx % 3 == 0 and idx > 0:
-            elements.append(PageBreak())
-        
-        # Add item heading
-        item_title = f"{item.display_name or item.group_id} - {item.sponsor_logo_name or 'N/A'}"
-        elements.append(Paragraph(item_title, heading_style))
-        elements.append(Spacer(1, 0.1*inch))
-        
-        # Add details table
-        details_data = [
-            ['Camera ID:', item.group_id],
-            ['Display Name:', item.display_name or 'N/A'],
-            ['Sponsor Logo Name:', item.sponsor_logo_name or 'N/A'],
-            ['Time on Air:', f"{format_time_duration(item.time_on_air)}"],
-            ['Time on Camera:', f"{format_time_duration(item.time_on_camera)}"],
-            ['Date Time:', item.created_at.strftime('%Y-%m-%d %H:%M:%S')],
-        ]
-        
-        details_table = Table(details_data, colWidths=[2*inch, 4*inch])
-        details_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#ecf0f1')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2c3e50')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
-        elements.append(details_table)
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Add histogram
-        histogram_data = item.get_histogram_data()
-        if histogram_data['values']:
-            # Create chart
-            drawing = Drawing(400, 250)
-            chart = VerticalBarChart()
-            chart.x = 30
-            chart.y = 30
-            chart.height = 180
-            chart.width = 350
-            chart.data = [histogram_data['values']]
-            chart.categoryAxis.categoryNames = histogram_data['labels']
-            
-            chart.categoryAxis.labels.angle = 45
-            chart.categoryAxis.labels.fontSize = 8
-            chart.categoryAxis.labels.dy = -15
-            chart.categoryAxis.labels.fontName = 'Helvetica'
-            
-            chart.valueAxis.valueMin = 0
-            chart.valueAxis.labels.fontSize = 8
-            chart.valueAxis.labels.dx = -10
-            chart.valueAxis.labels.fontName = 'Helvetica'
-            chart.valueAxis.valueMax = max(histogram_data['values']) * 1.1 if histogram_data['values'] else 100
-            chart.bars[0].fillColor = colors.HexColor('#3498db')
-            chart.bars[0].strokeColor = colors.HexColor('#2980b9')
-            chart.bars[0].strokeWidth = 0.5
-
-            
-            drawing.add(chart)
-            elements.append(Paragraph("Percentage Visibility v. Time on Screen (%)", bar_title))
-            elements.append(drawing)
-    
-    # Build PDF
-    doc.build(elements, onFirstPage=header)
-    buffer.seek(0)
-    
-    # Return PDF response
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="viz_data_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-    
-    return response
+def export_pdf_job(request):
+    """Queue a PDF export of the selected rows and return the job to poll"""
+    selected_ids = request.POST.getlist('selected_ids[]')
+
+    if not selected_ids:
+        return JsonResponse({'success': False, 'error': 'No items selected'}, status=400)
+
+    try:
+        job = submit_export([int(pk) for pk in selected_ids])
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'selected_ids must be integers'}, status=400)
+
+    return JsonResponse(export_job_payload(job), status=202)
+
+def export_job_status(request, job_id):
+    """API endpoint reporting the state of a PDF export job"""
+    try:
+        job = ExportJob.objects.get(pk=job_id)
+    except ExportJob.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Job not found'}, status=404)
+    return JsonResponse(export_job_payload(fail_if_stale(job)))
+
+def export_job_download(request, job_id):
+    """Download the PDF rendered by a finished export job"""
+    try:
+        job = ExportJob.objects.get(pk=job_id, status=ExportJob.DONE)
+        report = open(job.file_path, 'rb')
+    except (ExportJob.DoesNotExist, FileNotFoundError):
+        return HttpResponse('Report not available', status=404)
+    return FileResponse(report, as_attachment=True, filename=job.filename, content_type='application/pdf')
+
+def export_job_payload(job):
+    payload = {
+        'success': job.status != ExportJob.FAILED,
+        'job_id': str(job.id),
+        'status': job.status,
+        'progress': job.progress,
+        'status_url': reverse('viz:export_job_status', args=[job.id]),
+    }
+    if job.status == ExportJob.DONE:
+        payload['download_url'] = reverse('viz:export_job_download', args=[job.id])
+    if job.status == ExportJob.FAILED:
+        payload['error'] = job.error
+    return payload
+
+async def report_archive(request):
+    """API endpoint listing the pre-rendered daily reports, newest day first
+
+    Narrowed with ``date`` (YYYY-MM-DD) and ``viz_name``; ``viz_name=`` with
+    an empty value selects the all-logos reports.
+    """
+    reports = ArchivedReport.objects.all()
+    if request.GET.get('date'):
+        day = parse_day(request.GET['date'])
+        if day is None:
+            return JsonResponse({'success': False, 'error': 'date must be YYYY-MM-DD'}, status=400)
+        reports = reports.filter(day=day)
+    if 'viz_name' in request.GET:
+        reports = reports.filter(sponsor_logo_name=request.GET['viz_name'])
+
+    limit = getattr(settings, 'VIZ_REPORT_ARCHIVE_PAGE_SIZE', 100)
+    return JsonResponse({'success': True, 'data': [{
+        'day': report.day.isoformat(),
+        'viz_name': report.sponsor_logo_name,
+        'row_count': report.row_count,
+        'size': report.size,
+        'generated_at': report.generated_at.isoformat(),
+        'download_url': reverse('viz:archived_report_download', args=[report.pk]),
+    } async for report in reports[:limit]]})
+
+async def archived_report_download(request, pk):
+    """Download a pre-rendered daily report"""
+    try:
+        report = await ArchivedReport.objects.aget(pk=pk)
+        f = open(report.file_path, 'rb')
+        # Regenerating swaps in a new file, so report.size may describe another one
+        size = os.fstat(f.fileno()).st_size
+    except (ArchivedReport.DoesNotExist, FileNotFoundError):
+        return HttpResponse('Report not available', status=404)
+    if serves_async(request):
+        response = StreamingHttpResponse(stream_file(f), content_type='application/pdf')
+        response['Content-Disposition'] = content_disposition_header(True, report.filename)
+        response['Content-Length'] = size
+        return response
+    return FileResponse(f, as_attachment=True, filename=report.filename, content_type='application/pdf')
+
+def metrics(request):
+    """Request counters and timings of this process in Prometheus text format"""
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
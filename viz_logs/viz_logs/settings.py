@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'viz.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,20 +76,54 @@ WSGI_APPLICATION = 'viz_logs.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'vr_logs',
-        'USER': 'root',
-        'PASSWORD': 'root',
-        'HOST': '127.0.0.1',
-        'PORT': '3306',
-        'OPTIONS': {
-            'charset': 'utf8mb4',
-            'init_command': "SET sql_mode='STRICT_TRANS_TABLES'"
-        },
+# Configured from the environment so each deployment can tune it.
+# DB_ENGINE: 'mysql_pool' (MySQL through the pooled backend in viz.db.mysql_pool,
+# connections shared by all threads of a worker, which suits ASGI), 'mysql'
+# (Django's backend; DB_CONN_MAX_AGE keeps a connection per thread) or 'sqlite'
+# (a local file, for tests and benchmarks when no MySQL is at hand).
+DB_ENGINE = os.environ.get('DB_ENGINE', 'mysql_pool')
+
+# Longest GROUP_CONCAT result MySQL returns, e.g. the camera list of one sponsor logo
+VIZ_GROUP_CONCAT_MAX_LEN = 1024 * 1024
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'viz.db.mysql_pool' if DB_ENGINE == 'mysql_pool' else 'django.db.backends.mysql',
+            'NAME': os.environ.get('MYSQL_DATABASE', 'vr_logs'),
+            'USER': os.environ.get('MYSQL_USER', 'root'),
+            'PASSWORD': os.environ.get('MYSQL_PASSWORD', 'root'),
+            'HOST': os.environ.get('MYSQL_HOST', '127.0.0.1'),
+            'PORT': os.environ.get('MYSQL_PORT', '3306'),
+            # The pool keeps connections open itself, so Django should hand them back after each request
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0 if DB_ENGINE == 'mysql_pool' else 60)),
+            # Ping a kept connection before reusing it
+            'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+            'OPTIONS': {
+                'charset': 'utf8mb4',
+                # group_concat_max_len defaults to 1024 bytes, see viz.aggregation.GroupConcat
+                'init_command': f"SET sql_mode='STRICT_TRANS_TABLES', group_concat_max_len={VIZ_GROUP_CONCAT_MAX_LEN}",
+                'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+    if DB_ENGINE == 'mysql_pool':
+        # Per worker process: open connections at most, seconds to wait for one, and
+        # seconds after which an idle (max_idle) or any (max_lifetime) connection is replaced.
+        # Keep max_lifetime below the server's wait_timeout.
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+            'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', 3600)),
+        }
 
 
 # Password validation
@@ -135,3 +170,109 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Viz dashboard
+
+# Rows rendered per page of the index table (and the upper bound a client may ask for)
+VIZ_PAGE_SIZE = 100
+VIZ_MAX_PAGE_SIZE = 500
+
+# Filter dropdown cache: full rebuild interval and how often to look for new rows (seconds).
+# Set VIZ_FACET_CACHE_ALIAS to a CACHES alias to share the facets between worker processes.
+VIZ_FACET_TTL = 300
+VIZ_FACET_CHECK_INTERVAL = 5
+VIZ_FACET_CACHE_ALIAS = None
+
+# Search box backend: 'fulltext' uses the ngram FULLTEXT index (MySQL only),
+# 'basic' uses icontains, 'auto' picks fulltext on MySQL and basic elsewhere.
+VIZ_SEARCH_BACKEND = 'auto'
+
+# Most rows one /api/histograms/ call may return
+VIZ_HISTOGRAM_BATCH_LIMIT = 100
+
+# Background PDF exports: worker pool kind ('thread' or 'process') and size,
+# where finished reports are written and how long they are kept, and how long a job
+# may stay pending or running before it is reported as failed.
+VIZ_EXPORT_EXECUTOR = 'thread'
+VIZ_EXPORT_WORKERS = 2
+VIZ_EXPORT_DIR = os.path.join(BASE_DIR, 'exports')
+VIZ_EXPORT_RETENTION_HOURS = 24
+VIZ_EXPORT_TIMEOUT_SECONDS = 600
+
+# Report charts are built in a pool of this many processes once a report has
+# at least VIZ_REPORT_PARALLEL_MIN_ITEMS sections; 1 renders everything serially.
+VIZ_REPORT_RENDER_WORKERS = os.cpu_count() or 1
+VIZ_REPORT_PARALLEL_MIN_ITEMS = 20
+
+# Cache of rendered report charts keyed by histogram content: 'memory' (per process),
+# 'disk' (shared under VIZ_CHART_CACHE_DIR) or None to disable. LRU-evicted past the byte limit.
+VIZ_CHART_CACHE_BACKEND = 'memory'
+VIZ_CHART_CACHE_DIR = os.path.join(BASE_DIR, 'chart_cache')
+VIZ_CHART_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Bearer tokens accepted by /api/ingest/ (comma separated in the environment)
+# and how many rows are written per bulk insert transaction.
+VIZ_INGEST_TOKENS = [token for token in os.environ.get('VIZ_INGEST_TOKENS', '').split(',') if token]
+VIZ_INGEST_CHUNK_SIZE = 1000
+
+# Rows fetched per query by the streaming CSV / NDJSON exports
+VIZ_EXPORT_CHUNK_SIZE = 2000
+
+# PDF exports are kept in memory up to this size, then spilled to a temporary file
+VIZ_PDF_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+# Requests slower than this many milliseconds are logged with their SQL to the
+# 'viz.slow' logger (None disables it); only this fraction of them is logged.
+VIZ_SLOW_REQUEST_MS = None
+VIZ_SLOW_REQUEST_SAMPLE_RATE = 1.0
+
+# Browser cache lifetime of single-row responses (rows are never modified), in seconds
+VIZ_ROW_MAX_AGE = 365 * 24 * 3600
+
+# Rendered table pages, keyed by filters and the newest row id (see viz.caching).
+# VIZ_FRAGMENT_CACHE picks the store: 'locmem' (per process), 'file' (shared under
+# VIZ_FRAGMENT_CACHE_DIR) or 'redis' (VIZ_REDIS_URL, needs the redis package; its size
+# is bounded by the server's maxmemory policy rather than MAX_ENTRIES). 'none' disables it.
+VIZ_FRAGMENT_CACHE = os.environ.get('VIZ_FRAGMENT_CACHE', 'locmem')
+VIZ_FRAGMENT_CACHE_DIR = os.path.join(BASE_DIR, 'fragment_cache')
+VIZ_REDIS_URL = os.environ.get('VIZ_REDIS_URL', 'redis://127.0.0.1:6379/1')
+VIZ_FRAGMENT_CACHE_BACKENDS = {
+    'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'viz-fragments'},
+    'file': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': VIZ_FRAGMENT_CACHE_DIR},
+    'redis': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': VIZ_REDIS_URL},
+}
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+if VIZ_FRAGMENT_CACHE in VIZ_FRAGMENT_CACHE_BACKENDS:
+    CACHES['fragments'] = {
+        **VIZ_FRAGMENT_CACHE_BACKENDS[VIZ_FRAGMENT_CACHE],
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+VIZ_FRAGMENT_CACHE_ALIAS = 'fragments' if 'fragments' in CACHES else None
+
+# Live table updates (/api/live/): how often the shared watcher looks for new rows (seconds),
+# most rows per pushed event, how long one stream stays open before the browser reconnects,
+# the keep-alive interval, and the reconnect delay sent to the browser (also the polling
+# interval when served over WSGI).
+VIZ_LIVE_POLL_INTERVAL = 1.0
+VIZ_LIVE_BATCH_SIZE = 200
+VIZ_LIVE_STREAM_SECONDS = 300
+VIZ_LIVE_HEARTBEAT_SECONDS = 15
+VIZ_LIVE_RETRY_MS = 3000
+
+# Retention (manage.py archive_viz_data): whole months kept in viz_data besides the current one,
+# older months move to viz_data_archive; rows moved per transaction.
+VIZ_ARCHIVE_KEEP_MONTHS = 6
+VIZ_ARCHIVE_BATCH_SIZE = 5000
+
+# Pre-rendered daily reports (manage.py generate_reports): where they are written and
+# how many /reports/ lists at most
+VIZ_REPORT_ARCHIVE_DIR = os.path.join(BASE_DIR, 'reports')
+VIZ_REPORT_ARCHIVE_PAGE_SIZE = 100
+
+# Exposure rollups: rows are only folded in once they are this old (seconds), so inserts that
+# commit out of id order are not skipped; no insert transaction may stay open longer than this
+VIZ_ROLLUP_SETTLE_SECONDS = 60